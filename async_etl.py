@@ -0,0 +1,247 @@
+"""
+Asyncio execution mode for the DatabaseETL backends
+
+Usage:
+
+# PostgreSQL through an asyncpg connection pool
+ETL_ASYNC=1 python load_tables_daily.py
+
+# Vertica through a thread pool of vertica_python connections
+DB_TYPE=vertica ETL_ASYNC=1 ETL_POOL_SIZE=4 python load_tables_daily.py
+"""
+
+import asyncio
+import json
+import queue
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from load_tables_daily import PostgreSQLETL, VerticaETL, vertica_errors
+
+
+class AsyncETLMixin(ABC):
+    """Run DatabaseETL statements on a background asyncio event loop.
+
+    The synchronous DatabaseETL interface is kept: execute_query and
+    fetch_results submit a coroutine to the loop and wait for the result, so
+    they can be called from many pipeline threads at once while each
+    statement runs on its own pooled connection.
+    """
+
+    def _start_loop(self, pool_size: int):
+        self.pool_size = pool_size
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._loop_thread.start()
+
+    def run(self, coro):
+        """Run a coroutine on the background loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    @abstractmethod
+    async def aexecute_query(self, query: str, params: Optional[Any] = None):
+        """Execute a query on a pooled connection"""
+
+    @abstractmethod
+    async def afetch_results(self, query: str) -> List[Any]:
+        """Fetch query results from a pooled connection"""
+
+    @abstractmethod
+    async def _aclose(self):
+        """Close the pooled connections"""
+
+    def execute_query(self, query: str, params: Optional[Any] = None):
+        """Execute a query on a pooled connection"""
+        return self.run(self.aexecute_query(query, params))
+
+    def fetch_results(self, query: str) -> List[Any]:
+        """Fetch query results from a pooled connection"""
+        return self.run(self.afetch_results(query))
+
+    def fetch_many(self, queries: List[str]) -> List[List[Any]]:
+        """Fetch results for several queries concurrently"""
+
+        async def gather():
+            return await asyncio.gather(*(self.afetch_results(q) for q in queries))
+
+        return list(self.run(gather()))
+
+    def execute_parallel(
+        self,
+        queries: List[str],
+        max_workers: int = 4,
+        groups: Optional[List[str]] = None,
+        group_limits: Optional[Dict[str, int]] = None,
+    ) -> List[Tuple[str, float, Optional[str]]]:
+        """Execute independent statements concurrently on the pool"""
+        groups = groups or [None] * len(queries)
+
+        async def run_one(query: str, group_semaphore, semaphore):
+            async with group_semaphore, semaphore:
+                start = time.time()
+                try:
+                    await self.aexecute_query(query)
+                    return query, time.time() - start, None
+                except Exception as e:
+                    return query, time.time() - start, str(e)
+
+        async def gather():
+            # Semaphores are bound to the loop they are created on
+            semaphore = asyncio.Semaphore(max_workers)
+            group_semaphores = {
+                group: asyncio.Semaphore(max(limit, 1))
+                for group, limit in (group_limits or {}).items()
+            }
+            unlimited = asyncio.Semaphore(len(queries) or 1)
+            return await asyncio.gather(
+                *(
+                    run_one(q, group_semaphores.get(g, unlimited), semaphore)
+                    for q, g in zip(queries, groups)
+                )
+            )
+
+        return list(self.run(gather()))
+
+    def for_each_table(self, func: Callable[[str], Any], file_list: List[str]):
+        """Run a per-file pipeline step for up to pool_size files at once"""
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            for future in [executor.submit(func, csv_file) for csv_file in file_list]:
+                future.result()
+
+    def close_connection(self):
+        """Close the pool and stop the event loop"""
+        try:
+            self.run(self._aclose())
+        except Exception as e:
+            print(f"Error closing connection: {e}")
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._loop_thread.join()
+            self.loop.close()
+
+
+class AsyncPostgreSQLETL(AsyncETLMixin, PostgreSQLETL):
+    """PostgreSQL DatabaseETL backed by an asyncpg connection pool"""
+
+    def __init__(self, config_file: str = "config.json", pool_size: int = 8):
+        super().__init__(config_file)
+        self.pool = None
+        self._start_loop(pool_size)
+
+    def get_db_connection(self):
+        """Create the asyncpg pool from the SQLAlchemy connection URI"""
+        with open(self.config_file) as f:
+            config = json.load(f)
+            # asyncpg does not understand SQLAlchemy driver suffixes
+            dsn = re.sub(r"^postgresql\+\w+://", "postgresql://", config["connection_uri"])
+
+        import asyncpg
+
+        self.pool = self.run(
+            asyncpg.create_pool(dsn, min_size=1, max_size=self.pool_size)
+        )
+        self.connection = self.pool
+        return self.connection
+
+    async def aexecute_query(self, query: str, params: Optional[Any] = None):
+        """Execute PostgreSQL query; params are positional ($1, $2, ...)"""
+        async with self.pool.acquire() as conn:
+            if params:
+                await conn.execute(query, *params)
+            else:
+                await conn.execute(query)
+
+    async def afetch_results(self, query: str) -> List[Any]:
+        """Fetch PostgreSQL query results"""
+        import asyncpg
+
+        try:
+            async with self.pool.acquire() as conn:
+                return [tuple(record) for record in await conn.fetch(query)]
+        except asyncpg.PostgresError as e:
+            print(f"Query error: {e}")
+            return []
+
+    def copy_stream(self, table_name: str, stream) -> int:
+        """PostgreSQL COPY FROM STDIN through asyncpg's copy_to_table"""
+        schema, _, table = table_name.rpartition(".")
+
+        async def copy():
+            async with self.pool.acquire() as conn:
+                status = await conn.copy_to_table(
+                    table,
+                    source=stream,
+                    schema_name=schema or None,
+                    format="csv",
+                    header=True,
+                )
+            return int(status.split()[-1])
+
+        return self.run(copy())
+
+    async def _aclose(self):
+        if self.pool is not None:
+            await self.pool.close()
+
+
+class AsyncVerticaETL(AsyncETLMixin, VerticaETL):
+    """Vertica DatabaseETL running the blocking driver on a thread pool"""
+
+    def __init__(self, config_file: str = "config.json", pool_size: int = 8):
+        super().__init__(config_file)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self._connections: "queue.Queue" = queue.Queue()
+        self._all_connections = []
+        self._start_loop(pool_size)
+
+    def get_db_connection(self):
+        """Open pool_size Vertica connections, the first one doubling as primary"""
+        super().get_db_connection()
+        self._all_connections.append(self.connection)
+        for _ in range(self.pool_size - 1):
+            self._all_connections.append(self.open_connection())
+        for conn in self._all_connections:
+            self._connections.put(conn)
+        return self.connection
+
+    def _run_blocking(self, query: str, params: Optional[Any], fetch: bool):
+        conn = self._connections.get()
+        try:
+            cursor = conn.cursor()
+            if fetch:
+                try:
+                    cursor.execute(query)
+                    if cursor.rowcount == 0:
+                        return []
+                    return cursor.fetchall()
+                except vertica_errors.QueryError as e:
+                    print(f"Query error: {e}")
+                    return []
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            conn.commit()
+        finally:
+            self._connections.put(conn)
+
+    async def aexecute_query(self, query: str, params: Optional[Any] = None):
+        """Execute Vertica query on a pooled connection"""
+        await self.loop.run_in_executor(
+            self.executor, self._run_blocking, query, params, False
+        )
+
+    async def afetch_results(self, query: str) -> List[Any]:
+        """Fetch Vertica query results on a pooled connection"""
+        return await self.loop.run_in_executor(
+            self.executor, self._run_blocking, query, None, True
+        )
+
+    async def _aclose(self):
+        self.executor.shutdown(wait=True)
+        for conn in self._all_connections:
+            conn.close()
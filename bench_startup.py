@@ -0,0 +1,52 @@
+"""
+Startup-time benchmark for the CLI entry points
+
+Runs each entry point with --help (and the dry-run modes) several times in
+a fresh interpreter and prints the best and median wall time.
+
+Usage:
+
+python bench_startup.py [--runs N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = [
+    ["load_tables_daily.py", "--help"],
+    ["load_tables_daily.py", "--dry-run"],
+    ["vertica_upload.py", "--help"],
+    ["vertica_upload.py", "daily", "--dry-run"],
+    ["data-type-pandas.py", "--help"],
+]
+
+
+def time_command(command, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup-time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'command':<45} {'best':>8} {'median':>8}")
+    for command in COMMANDS:
+        best, median = time_command(command, args.runs)
+        print(f"{' '.join(command):<45} {best:>7.3f}s {median:>7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Shared connection manager for the upload phases
+
+Reads config.json once, keeps one pooled SQLAlchemy engine per connection
+string and a bounded pool of Vertica connections. Vertica connections are
+health-checked on checkout and replaced when they have gone stale, so the
+same sessions are reused across create, load and history phases and by
+concurrent COPY workers.
+"""
+
+import json
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from lazy_import import lazy_import
+
+sa = lazy_import("sqlalchemy")
+vertica_python = lazy_import("vertica_python")
+
+# config.json keys that are not vertica_python connection options
+NON_VERTICA_KEYS = ("pg_str", "connection_uri", "embedded_path")
+
+
+class ConnectionManager:
+    """Pools PostgreSQL engines and Vertica connections for one process"""
+
+    def __init__(self, config_file: str = "config.json", vertica_pool_size: int = 4):
+        self.config_file = config_file
+        self.vertica_pool_size = vertica_pool_size
+        self._config = None
+        self._engines: Dict[str, Any] = {}
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(vertica_pool_size)
+        self._lock = threading.Lock()
+        self._opened: List[Any] = []
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        if self._config is None:
+            with open(self.config_file) as f:
+                self._config = json.load(f)
+        return self._config
+
+    def connection_str(self, key: str) -> str:
+        return self.config[key]
+
+    def vertica_conn_info(self) -> Dict[str, Any]:
+        conn_info = {
+            k: v for k, v in self.config.items() if k not in NON_VERTICA_KEYS
+        }
+        conn_info["use_prepared_statements"] = True
+        return conn_info
+
+    def postgres_engine(self, key: str = "pg_str"):
+        """Pooled engine for a connection string key, created once"""
+        with self._lock:
+            if key not in self._engines:
+                self._engines[key] = sa.create_engine(
+                    self.connection_str(key), pool_pre_ping=True
+                )
+            return self._engines[key]
+
+    def postgres(self, key: str = "pg_str"):
+        """Checkout a PostgreSQL connection; close() returns it to the pool"""
+        return self.postgres_engine(key).connect()
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._opened:
+                self._opened.remove(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def open_vertica(self):
+        """Open a dedicated long-lived Vertica session that takes no pool slot.
+
+        A control session held for the whole run must not count against
+        the pool, or concurrent COPY workers would be one session short
+        (and block forever with a pool of one).
+        """
+        conn = vertica_python.connect(**self.vertica_conn_info())
+        with self._lock:
+            self._opened.append(conn)
+        return conn
+
+    def acquire_vertica(self):
+        """Checkout a healthy Vertica connection, blocking while the pool is full"""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = vertica_python.connect(**self.vertica_conn_info())
+                    with self._lock:
+                        self._opened.append(conn)
+                    return conn
+                if self._is_healthy(conn):
+                    return conn
+                logging.warning("Dropping stale Vertica connection")
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release_vertica(self, conn, broken: bool = False):
+        """Return a Vertica connection to the pool"""
+        if broken:
+            self._discard(conn)
+        else:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def vertica(self):
+        """Borrow a Vertica connection for the duration of a with-block"""
+        conn = self.acquire_vertica()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = not self._is_healthy(conn)
+            raise
+        finally:
+            self.release_vertica(conn, broken)
+
+    def close_all(self):
+        """Close every connection and engine owned by the manager"""
+        with self._lock:
+            opened, self._opened = self._opened, []
+            engines, self._engines = list(self._engines.values()), {}
+        for conn in opened:
+            try:
+                conn.close()
+            except Exception as ex:
+                logging.error(ex)
+        for engine in engines:
+            engine.dispose()
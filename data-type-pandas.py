@@ -1,9 +1,19 @@
 # Analyzes CSV files to extract column data types using pandas
 # Reads file list and outputs TABLE,COLUMN,TYPE format
 
+import argparse
 import time
 
-import pandas as pd
+from lazy_import import lazy_import
+
+# pandas is only imported once a file is actually read
+pd = lazy_import("pandas")
+
+parser = argparse.ArgumentParser(description="Print pandas dtypes of CSV columns")
+parser.add_argument(
+    "--all", action="store_true", help="Analyze every file in files.list, not just the first"
+)
+args = parser.parse_args()
 
 start = time.time()
 filepath = "../files/"
@@ -33,8 +43,10 @@ def a_file(f):
 
 try:
     print("TABLE,COLUMN,TYPE")
-    # all_files()
-    a_file(file_names[0])
+    if args.all:
+        all_files()
+    else:
+        a_file(file_names[0])
 except Exception as ex:
     print(ex)
 finally:
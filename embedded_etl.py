@@ -0,0 +1,387 @@
+"""
+Embedded DatabaseETL backends for offline staging, type inference and benchmarks
+
+Usage:
+
+# DuckDB (pip install duckdb), files under embedded_path from config.json
+python load_tables_daily.py --db-type duckdb
+
+# SQLite from the standard library, one attached database file per schema
+python load_tables_daily.py --db-type sqlite
+
+# DuckDB when installed, SQLite otherwise
+python load_tables_daily.py --db-type embedded
+
+Both run the full pipeline without a server. DuckDB ingests CSV natively
+with COPY (streams are spooled to a temporary file first); SQLite streams
+rows in through executemany. Neither builds indexes, since _build index
+names would outlive the table swap.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import zlib
+from abc import abstractmethod
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+import transforms
+from lazy_import import is_available, lazy_import
+from load_tables_daily import CHECKSUM_MODULUS, DatabaseETL
+
+duckdb = lazy_import("duckdb")
+
+DEFAULT_EMBEDDED_PATH = "embedded"
+INSERT_BATCH_ROWS = 10000
+SPOOL_BUFFER_SIZE = 1 << 20
+SQLITE_RANDOM_RANGE = 1 << 20
+
+# Validity checks standing in for a failing cast, which SQLite never raises
+SQLITE_INTEGER_CHECK = "CAST(CAST({c} AS INTEGER) AS TEXT) = {c}"
+SQLITE_CAST_CHECKS = {
+    "smallint": SQLITE_INTEGER_CHECK
+    + " AND CAST({c} AS INTEGER) BETWEEN -32768 AND 32767",
+    "integer": SQLITE_INTEGER_CHECK
+    + " AND CAST({c} AS INTEGER) BETWEEN -2147483648 AND 2147483647",
+    "bigint": SQLITE_INTEGER_CHECK,
+    "numeric": "etl_is_numeric({c})",
+    "boolean": "lower({c}) IN ('true', 'false', 't', 'f')",
+    "date": "date({c}) IS NOT NULL",
+    "timestamp": "datetime({c}) IS NOT NULL",
+}
+
+SQLITE_CAST_EXPRESSIONS = {
+    "smallint": "CAST({c} AS INTEGER)",
+    "integer": "CAST({c} AS INTEGER)",
+    "bigint": "CAST({c} AS INTEGER)",
+    "numeric": "CAST({c} AS REAL)",
+    "boolean": "lower({c}) IN ('true', 't')",
+    "date": "date({c})",
+    "timestamp": "datetime({c})",
+}
+
+
+def sqlite_hash(value) -> Optional[int]:
+    """CRC32 of a value's text, registered as etl_hash() on SQLite connections"""
+    if value is None:
+        return None
+    return zlib.crc32(str(value).encode("utf-8"))
+
+
+def sqlite_is_numeric(value) -> bool:
+    """Whether CAST(value AS REAL) keeps the whole value, registered as etl_is_numeric()"""
+    if isinstance(value, (int, float)):
+        return True
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    # float() also takes "nan", "inf" and "1_000", which SQLite reads as 0 or 1
+    return not re.search(r"[^0-9.eE+\-\s]", value)
+
+
+def create_embedded_etl(db_type: str, config_file: str = "config.json") -> DatabaseETL:
+    """DuckDBETL or SQLiteETL; "embedded" prefers DuckDB when it is installed"""
+    db_type = db_type.lower()
+    if db_type == "embedded":
+        db_type = "duckdb" if is_available("duckdb") else "sqlite"
+    if db_type == "duckdb":
+        return DuckDBETL(config_file)
+    return SQLiteETL(config_file)
+
+
+class EmbeddedETL(DatabaseETL):
+    """Shared plumbing of the in-process backends: one serialized connection"""
+
+    def __init__(self, config_file: str = "config.json"):
+        super().__init__(config_file)
+        self.copy_format = transforms.POSTGRESQL_FORMAT
+        self.embedded_path = DEFAULT_EMBEDDED_PATH
+        self._lock = threading.RLock()
+
+    def read_config(self) -> Dict[str, Any]:
+        if not os.path.exists(self.config_file):
+            return {}
+        with open(self.config_file) as f:
+            return json.load(f)
+
+    def get_db_connection(self):
+        self.embedded_path = self.read_config().get(
+            "embedded_path", DEFAULT_EMBEDDED_PATH
+        )
+        os.makedirs(self.embedded_path, exist_ok=True)
+        self.connection = self.connect()
+        return self.connection
+
+    @abstractmethod
+    def connect(self):
+        """Open the engine's connection under embedded_path"""
+
+    def execute_query(self, query: str, params: Optional[Any] = None):
+        with self._lock:
+            self.connection.execute(query, params or [])
+
+    def fetch_results(self, query: str) -> List[Any]:
+        try:
+            with self._lock:
+                return self.connection.execute(query).fetchall()
+        except Exception as e:
+            print(f"Query error: {e}")
+            return []
+
+    def get_create_index_syntax(
+        self, table_name: str, index_name: str, columns: List[str]
+    ) -> Optional[str]:
+        """No indexes: the staging copy is scanned, not probed"""
+        return None
+
+    def load_csv_file(self, table_name: str, file_path: str) -> int:
+        """Fastest native load of a CSV file (header included), return rows loaded"""
+        with open(file_path, "rb") as stream:
+            return self.copy_stream(table_name, stream)
+
+
+class DuckDBETL(EmbeddedETL):
+    """DuckDB implementation of DatabaseETL"""
+
+    def __init__(self, config_file: str = "config.json"):
+        super().__init__(config_file)
+        self.default_data_type = "varchar"
+
+    def connect(self):
+        return duckdb.connect(os.path.join(self.embedded_path, "etl.duckdb"))
+
+    def prepare_schema(self, schema: str):
+        self.execute_query(f"CREATE SCHEMA IF NOT EXISTS {schema};")
+
+    def get_table_exists_query(self, table_name: str, schema: str) -> str:
+        return f"""
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_schema = '{schema}' AND table_name = '{table_name}'
+        """
+
+    def get_columns_query(self, table_name: str, schema: str) -> str:
+        return f"""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = '{schema}' AND table_name = '{table_name}'
+            ORDER BY ordinal_position
+        """
+
+    def get_alter_column_syntax(
+        self, table_name: str, column_name: str, data_type: str
+    ) -> str:
+        """DuckDB ALTER COLUMN syntax; bare NUMERIC would round to 3 decimals"""
+        if data_type == "numeric":
+            data_type = "double"
+        return (
+            f"ALTER TABLE {table_name} ALTER COLUMN {column_name} "
+            f"TYPE {data_type} USING CAST({column_name} AS {data_type});"
+        )
+
+    def get_table_counts_query(self, table_names: List[str], schema: str) -> str:
+        """DuckDB row counts kept in the catalog"""
+        names = ",".join(f"'{name}'" for name in table_names)
+        return f"""
+            SELECT table_name, estimated_size FROM duckdb_tables()
+            WHERE schema_name = '{schema}' AND table_name IN ({names});
+        """
+
+    def get_sample_query(
+        self, table_name: str, column_name: str, limit: int, percent: float
+    ) -> str:
+        """Row-level sampling: DuckDB's system sampling picks whole vectors"""
+        sample = f" TABLESAMPLE {percent:.6f}% (bernoulli)" if percent < 100 else ""
+        return (
+            f"SELECT {column_name} FROM {table_name}{sample} "
+            f"WHERE {column_name} IS NOT NULL LIMIT {limit};"
+        )
+
+    def get_analyze_syntax(self, table_name: str) -> str:
+        return f"ANALYZE {table_name};"
+
+    def get_checksum_aggregate(self, column_name: str) -> str:
+        return f"SUM(hash({column_name}) % {CHECKSUM_MODULUS})"
+
+    def load_csv_file(self, table_name: str, file_path: str) -> int:
+        """DuckDB's parallel CSV reader through COPY"""
+        path = os.path.abspath(file_path).replace("'", "''")
+        with self._lock:
+            return self.connection.execute(
+                f"COPY {table_name} FROM '{path}' (HEADER, DELIMITER ',');"
+            ).fetchone()[0]
+
+    def copy_stream(self, table_name: str, stream) -> int:
+        """Spool a file-like object to a temporary file and COPY it"""
+        with tempfile.NamedTemporaryFile(
+            "wb", suffix=".csv", dir=self.embedded_path, delete=False
+        ) as spool:
+            shutil.copyfileobj(stream, spool, SPOOL_BUFFER_SIZE)
+        try:
+            return self.load_csv_file(table_name, spool.name)
+        finally:
+            os.remove(spool.name)
+
+
+class SQLiteETL(EmbeddedETL):
+    """SQLite implementation of DatabaseETL, one attached database per schema"""
+
+    def __init__(self, config_file: str = "config.json"):
+        super().__init__(config_file)
+        self.default_data_type = "text"
+
+    def connect(self):
+        conn = sqlite3.connect(
+            os.path.join(self.embedded_path, "main.sqlite"),
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        # Staging data can be reloaded from the CSV files
+        conn.execute("PRAGMA synchronous = OFF;")
+        conn.create_function("etl_hash", 1, sqlite_hash, deterministic=True)
+        conn.create_function(
+            "etl_is_numeric", 1, sqlite_is_numeric, deterministic=True
+        )
+        return conn
+
+    def prepare_schema(self, schema: str):
+        attached = {row[1] for row in self.fetch_results("PRAGMA database_list;")}
+        if schema not in attached:
+            path = os.path.join(self.embedded_path, f"{schema}.sqlite")
+            self.execute_query(f"ATTACH DATABASE '{path}' AS {schema};")
+            self.execute_query(f"PRAGMA {schema}.journal_mode = WAL;")
+
+    def execute_query(self, query: str, params: Optional[Any] = None):
+        # SQLite has no DROP ... CASCADE; there are no dependent objects to drop
+        query = re.sub(r"\s+CASCADE\s*;?\s*$", ";", query, flags=re.IGNORECASE)
+        with self._lock:
+            if ";" in query.strip().rstrip(";") and not params:
+                self.connection.executescript(query)
+            else:
+                self.connection.execute(query, params or [])
+
+    def get_table_exists_query(self, table_name: str, schema: str) -> str:
+        return f"""
+            SELECT COUNT(*) FROM {schema}.sqlite_master
+            WHERE type = 'table' AND name = '{table_name}'
+        """
+
+    def get_columns_query(self, table_name: str, schema: str) -> str:
+        return f"SELECT name FROM pragma_table_info('{table_name}', '{schema}') ORDER BY cid"
+
+    def get_alter_column_syntax(
+        self, table_name: str, column_name: str, data_type: str
+    ) -> str:
+        """Rebuild the table, as SQLite cannot change a column's type in place.
+
+        The copy is created with the same column order, so typed columns stay
+        where the CSV header put them.
+        """
+        schema, name = table_name.split(".")
+        tmp_table = f"{table_name}__typed"
+        definitions = []
+        selects = []
+        for _, column, column_type, *_ in self.fetch_results(
+            f"PRAGMA {schema}.table_info('{name}');"
+        ):
+            if column == column_name:
+                column_type = data_type
+                expression = SQLITE_CAST_EXPRESSIONS.get(data_type, "{c}")
+                selects.append(expression.format(c=column))
+            else:
+                selects.append(column)
+            definitions.append(f"{column} {column_type}".strip())
+        return (
+            f"BEGIN;"
+            f"CREATE TABLE {tmp_table} ({', '.join(definitions)});"
+            f"INSERT INTO {tmp_table} SELECT {', '.join(selects)} FROM {table_name};"
+            f"DROP TABLE {table_name};"
+            f"ALTER TABLE {tmp_table} RENAME TO {name};"
+            f"COMMIT;"
+        )
+
+    def apply_column_type(self, table_name: str, column: str, data_type: str) -> str:
+        """Widen until every value passes the type's check, then rebuild the column"""
+        while data_type != self.default_data_type:
+            check = SQLITE_CAST_CHECKS.get(data_type)
+            if check is not None:
+                invalid = self.fetch_results(
+                    f"SELECT COUNT(*) FROM {table_name} "
+                    f"WHERE {column} IS NOT NULL AND NOT ({check.format(c=column)});"
+                )
+                if invalid and invalid[0][0] == 0:
+                    self.execute_query(
+                        self.get_alter_column_syntax(table_name, column, data_type)
+                    )
+                    return data_type
+            data_type = self._next_wider_type(data_type)
+        return data_type
+
+    def get_table_counts_query(self, table_names: List[str], schema: str) -> str:
+        """Exact counts; SQLite keeps no row statistics for tables"""
+        return " UNION ALL ".join(
+            f"SELECT '{name}', COUNT(*) FROM {schema}.{name}" for name in table_names
+        )
+
+    def get_catalog_record_counts(
+        self, table_schema: str, table_names: List[str]
+    ) -> Dict[str, int]:
+        attached = {row[1] for row in self.fetch_results("PRAGMA database_list;")}
+        if table_schema not in attached:
+            return {}
+        existing = [
+            name for name in table_names if self.is_table_exist(name, table_schema)
+        ]
+        return super().get_catalog_record_counts(table_schema, existing)
+
+    def get_sample_query(
+        self, table_name: str, column_name: str, limit: int, percent: float
+    ) -> str:
+        """SQLite has no TABLESAMPLE: keep each row with probability percent"""
+        sample = ""
+        if percent < 100:
+            threshold = int(percent / 100 * SQLITE_RANDOM_RANGE)
+            sample = f" AND (random() & {SQLITE_RANDOM_RANGE - 1}) < {threshold}"
+        return (
+            f"SELECT {column_name} FROM {table_name} "
+            f"WHERE {column_name} IS NOT NULL{sample} LIMIT {limit};"
+        )
+
+    def get_analyze_syntax(self, table_name: str) -> str:
+        return f"ANALYZE {table_name};"
+
+    def get_checksum_aggregate(self, column_name: str) -> str:
+        return f"SUM(etl_hash({column_name}))"
+
+    def copy_stream(self, table_name: str, stream) -> int:
+        """Batched executemany inserts; empty fields become NULL like COPY"""
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        reader = csv.reader(text)
+        header = next(reader, [])
+        placeholders = ",".join("?" for _ in header)
+        insert = f"INSERT INTO {table_name} ({','.join(header)}) VALUES ({placeholders})"
+        rows = 0
+        with self._lock:
+            self.connection.execute("BEGIN;")
+            try:
+                while True:
+                    batch = [
+                        [value if value != "" else None for value in row]
+                        for row in islice(reader, INSERT_BATCH_ROWS)
+                    ]
+                    if not batch:
+                        break
+                    self.connection.executemany(insert, batch)
+                    rows += len(batch)
+                self.connection.execute("COMMIT;")
+            except Exception:
+                self.connection.execute("ROLLBACK;")
+                raise
+        text.detach()
+        return rows
@@ -0,0 +1,116 @@
+"""
+Queue-based logging setup and progress reporting for the pipelines
+
+Log records are put on a queue by the calling thread and written to the
+log file by a QueueListener thread, so file I/O never blocks a load or
+inference loop. ETL_LOG_FORMAT=json switches the file to one JSON object
+per line, including any extra= fields (table, rows, rows_per_sec, ...);
+ETL_LOG_LEVEL sets the level (default INFO, DEBUG adds per-column detail).
+
+Hot loops report through ProgressReporter, which logs one rows/sec summary
+every PROGRESS_INTERVAL seconds instead of a line per row.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from typing import Iterable, Iterator, Optional, TypeVar
+
+PROGRESS_INTERVAL = 10.0
+
+T = TypeVar("T")
+
+# LogRecord attributes that are not extra= fields
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with extra= fields as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(
+    filename: str, fmt: str, level: Optional[str] = None
+) -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a file written by a listener thread"""
+    level = level or os.getenv("ETL_LOG_LEVEL", "INFO")
+    file_handler = logging.FileHandler(filename)
+    if os.getenv("ETL_LOG_FORMAT", "text") == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(fmt))
+
+    log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    # Registered after logging's own shutdown hook, so it runs first and
+    # drains the queue before the file handler is closed
+    atexit.register(listener.stop)
+    return listener
+
+
+class ProgressReporter:
+    """Count work items and log a throughput summary every interval"""
+
+    def __init__(self, label: str, interval: float = PROGRESS_INTERVAL):
+        self.label = label
+        self.interval = interval
+        self.rows = 0
+        self.start = time.monotonic()
+        self._next_report = self.start + interval
+
+    def update(self, rows: int = 1):
+        self.rows += rows
+        now = time.monotonic()
+        if now >= self._next_report:
+            self._next_report = now + self.interval
+            self._log("progress", now)
+
+    def track(self, items: Iterable[T]) -> Iterator[T]:
+        """Pass items through, counting each one"""
+        for item in items:
+            self.update()
+            yield item
+
+    def done(self):
+        self._log("done", time.monotonic())
+
+    def _log(self, state: str, now: float):
+        seconds = max(now - self.start, 1e-6)
+        rate = self.rows / seconds
+        logging.info(
+            f"{self.label}: {state} {self.rows} rows in {seconds:.1f}s ({rate:.0f} rows/s)",
+            extra={
+                "progress": self.label,
+                "state": state,
+                "rows": self.rows,
+                "seconds": round(seconds, 3),
+                "rows_per_sec": round(rate, 1),
+            },
+            stacklevel=3,
+        )
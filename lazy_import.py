@@ -0,0 +1,39 @@
+"""
+Deferred imports for the CLI entry points
+
+Database drivers, SQLAlchemy, dateutil and pandas are only imported when a
+code path actually uses them, so --help, --dry-run and --plan start fast.
+"""
+
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy for a module that is imported when first used"""
+    return LazyModule(name)
+
+
+def is_available(name: str) -> bool:
+    """Check a top-level package is installed without importing it"""
+    return importlib.util.find_spec(name) is not None
@@ -8,33 +8,60 @@ python load_tables_daily.py
 
 # For Vertica
 DB_TYPE=vertica python load_tables_daily.py
+
+# Concurrent statements over a connection pool (see async_etl.py)
+ETL_ASYNC=1 ETL_POOL_SIZE=8 python load_tables_daily.py
+
+Tables, schema, paths and per-table tuning come from manifest.json
+(ETL_MANIFEST to use another file, see manifest.py).
 """
 
+import argparse
 import csv
 import datetime
 import json
 import logging
 import os
 import os.path
+import re
 import shutil
 import subprocess
 import sys
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import transforms
+import type_inference
+import vertica_loader
+from etl_logging import ProgressReporter, setup_logging
+from lazy_import import is_available, lazy_import
+from manifest import DEFAULT_MANIFEST, load_manifest, table_name_of
+from planner import RunMetrics, build_plan, print_plan
+from profiles import ProfileStore
+from profiling import RunProfiler
+
+# Drivers and parsers are imported on first use so that only the selected
+# backend is loaded, and --help/--dry-run never touch them.
+sa = lazy_import("sqlalchemy")
+vertica_python = lazy_import("vertica_python")
+vertica_errors = lazy_import("vertica_python.errors")
 
-import sqlalchemy as sa
-from dateutil import parser as dateParser
-from sqlalchemy import exc
+VERTICA_AVAILABLE = is_available("vertica_python")
 
-try:
-    from vertica_python import connect as vertica_connect
-    from vertica_python.errors import (ConnectionError, MissingSchema,
-                                       QueryError)
+# In-process backends, see embedded_etl.py
+EMBEDDED_DB_TYPES = ("duckdb", "sqlite", "embedded")
 
-    VERTICA_AVAILABLE = True
-except ImportError:
-    VERTICA_AVAILABLE = False
+# Phases timed in run_metrics.jsonl and estimated by --plan
+PIPELINE_PHASES = ["backup", "create", "load", "alter", "index", "diff", "switch"]
+
+# Per-value hashes are reduced modulo this prime before summing
+CHECKSUM_MODULUS = 1000000007
 
 
 class DatabaseETL(ABC):
@@ -45,6 +72,24 @@ class DatabaseETL(ABC):
         self.connection = None
         self.cursor = None
         self.default_data_type = "text"
+        # Adaptive type-inference sampling (see infer_column_types)
+        self.sample_initial = 1000
+        self.sample_max = 100000
+        self.sample_stable_rounds = 2
+        # Type guessing moves to a process pool once a sampling round has
+        # this many values
+        self.inference_workers = os.cpu_count() or 1
+        self.inference_parallel_min = 50000
+        self._inference_pool = None
+        self._inference_lock = threading.Lock()
+        # Rows reported by the load step, keyed by table name (without _build)
+        self.load_counts: Dict[str, int] = {}
+        # Known column types from the manifest, keyed by table name
+        self.known_column_types: Dict[str, Dict[str, str]] = {}
+        # Column types settled by alter_column, keyed by table name
+        self.applied_types: Dict[str, Dict[str, str]] = {}
+        # Rows per streamed COPY batch from the manifest, keyed by table name
+        self.shard_sizes: Dict[str, int] = {}
 
     @abstractmethod
     def get_db_connection(self):
@@ -72,6 +117,31 @@ class DatabaseETL(ABC):
     ) -> str:
         """Get ALTER COLUMN syntax for the database"""
 
+    @abstractmethod
+    def get_table_counts_query(self, table_names: List[str], schema: str) -> str:
+        """Get query returning (table_name, row_count) rows from catalog statistics"""
+
+    @abstractmethod
+    def get_create_index_syntax(
+        self, table_name: str, index_name: str, columns: List[str]
+    ) -> Optional[str]:
+        """Get CREATE INDEX syntax, or None if the database has no indexes"""
+
+    @abstractmethod
+    def get_analyze_syntax(self, table_name: str) -> str:
+        """Get statement refreshing optimizer statistics for a table"""
+
+    @abstractmethod
+    def copy_stream(self, table_name: str, stream) -> int:
+        """Load CSV data (header included) from a file-like object, return rows loaded"""
+
+    @abstractmethod
+    def get_checksum_aggregate(self, column_name: str) -> str:
+        """Get an order-independent aggregate hashing every value of a column"""
+
+    def prepare_schema(self, schema: str):
+        """Make sure a schema can be used; server schemas are created by the DBA"""
+
     def close_connection(self):
         """Close database connection"""
         if self.connection:
@@ -84,72 +154,51 @@ class DatabaseETL(ABC):
                 print(f"Error closing connection: {e}")
 
     def is_bool(self, string: str) -> bool:
-        return string.lower() in ("true", "false", "t", "f")
+        return type_inference.is_bool(string)
 
     def is_integer(self, string: str) -> bool:
-        try:
-            a = float(string)
-            n = int(a)
-            return a == n
-        except Exception:
-            return False
+        return type_inference.is_integer(string)
 
     def is_numeric(self, string: str) -> bool:
-        try:
-            float(string)
-            return True
-        except Exception:
-            return False
+        return type_inference.is_numeric(string)
 
     def is_date(self, string: str) -> bool:
-        try:
-            dt = dateParser.parse(string)
-            return (dt.hour, dt.minute, dt.second) == (0, 0, 0)
-        except Exception:
-            return False
+        return type_inference.is_date(string)
 
     def is_timestamp(self, string: str) -> bool:
-        try:
-            dateParser.parse(string)
-            return True
-        except Exception:
-            return False
+        return type_inference.is_timestamp(string)
 
     def guess_type(self, s: str) -> str:
-        if not s:
-            return self.default_data_type
-
-        if self.is_numeric(s):
-            try:
-                if float(s) == int(float(s)):
-                    if s in ("0", "1"):
-                        return "smallint"
-
-                    if s[0] == "0":
-                        return self.default_data_type
-
-                    if -32768 <= int(float(s)) <= 32767:
-                        return "smallint"
-
-                    if -2147483648 <= int(float(s)) <= 2147483647:
-                        return "integer"
-                    else:
-                        return "bigint"
-                else:
-                    return "numeric"
-            except Exception:
-                return "numeric"
-        else:
-            if self.is_bool(s):
-                return "boolean"
-
-            if self.is_timestamp(s):
-                if self.is_date(s):
-                    return "date"
-                else:
-                    return "timestamp"
+        return type_inference.guess_type(s, self.default_data_type)
+
+    def guess_type_sets(self, samples: List[List[str]]) -> List[set]:
+        """Type sets of column samples, in a process pool for large rounds"""
+        packed = [type_inference.pack_values(values) for values in samples]
+        sampled = sum(len(values) for values in samples)
+        if self.inference_workers > 1 and sampled >= self.inference_parallel_min:
+            with self._inference_lock:
+                if self._inference_pool is None:
+                    self._inference_pool = type_inference.create_pool(
+                        self.inference_workers
+                    )
+            return [
+                set(types)
+                for types in type_inference.guess_type_sets(
+                    packed,
+                    self.default_data_type,
+                    self._inference_pool,
+                    self.inference_workers,
+                )
+            ]
+        return [
+            set(type_inference.guess_type_set(values, self.default_data_type))
+            for values in packed
+        ]
 
-        return self.default_data_type
+    def close_inference_pool(self):
+        if self._inference_pool is not None:
+            self._inference_pool.shutdown()
+            self._inference_pool = None
 
     def create_table(self, file_path: str, table_name: str):
         """Create table based on CSV structure"""
@@ -181,6 +230,7 @@ class DatabaseETL(ABC):
 
     def import_csv_to_database(self, file_path: str, table_name: str):
         """Import CSV data to database table"""
+        progress = ProgressReporter(f"Insert {table_name}")
         with open(file_path, encoding="utf-8") as csvfile:
             csv_reader = csv.reader(csvfile, delimiter=",")
 
@@ -197,10 +247,14 @@ class DatabaseETL(ABC):
 
                 try:
                     self.execute_query(execute_string)
-                    print(f"Inserted row {line_count}, {len(row)} columns")
+                    progress.update()
                 except Exception as e:
                     print(f"Insert error at line {line_count}: {e}")
-                    print(f"Query: {execute_string}")
+                    logging.error(
+                        f"Insert error at line {line_count}: {e}",
+                        extra={"table": table_name, "query": execute_string},
+                    )
+        progress.done()
 
     def backup_history_file(
         self, file_location: str, csv_name: str, history_folder: str, date_time_str: str
@@ -252,57 +306,166 @@ class DatabaseETL(ABC):
             print(f"Query execution error: {e}")
             return []
 
-    def get_record_count(self, table_schema: str, table_name: str) -> int:
-        """Get record count for table"""
-        table_full = f"{table_schema}.{table_name}"
-        query = f"SELECT count(*) FROM {table_full};"
+    def get_catalog_record_counts(
+        self, table_schema: str, table_names: List[str]
+    ) -> Dict[str, int]:
+        """Get approximate record counts for many tables with one catalog query"""
+        if not table_names:
+            return {}
+        query = self.get_table_counts_query(table_names, table_schema)
         try:
             results = self.fetch_results(query)
-            return results[0][0] if results else 0
+            return {row[0]: int(row[1] or 0) for row in results}
         except Exception as e:
-            print(f"Record count error: {e}")
-            return 0
+            print(f"Catalog record count error: {e}")
+            return {}
+
+    def get_sample_query(
+        self, table_name: str, column_name: str, limit: int, percent: float
+    ) -> str:
+        """Get query returning non-null values of a column from a random
+        percent of the table (SQL standard TABLESAMPLE SYSTEM)"""
+        sample = f" TABLESAMPLE SYSTEM ({percent:.6f})" if percent < 100 else ""
+        return (
+            f"SELECT {column_name} FROM {table_name}{sample} "
+            f"WHERE {column_name} IS NOT NULL LIMIT {limit};"
+        )
+
+    def infer_column_types(
+        self, table_name: str, column_list: List[str], record_count: int
+    ) -> Dict[str, str]:
+        """Infer column types from a sample that grows while the types keep changing.
+
+        Each round draws a fresh random sample of about batch size values,
+        spread over the whole table, for every column still being analyzed.
+        A column is settled once its inferred type has stayed the same for
+        sample_stable_rounds batches or falls back to the default type; a
+        table no bigger than a batch is read whole in one round. The batch
+        size doubles only after a round in which some column's type changed.
+        """
+        type_sets: Dict[str, set] = {column: set() for column in column_list}
+        final_types: Dict[str, str] = {}
+        stable_rounds = {column: 0 for column in column_list}
+        sample_limit = min(record_count, self.sample_max)
+
+        active = list(column_list)
+        batch_size = self.sample_initial
+        sampled = 0
+        while active and sampled < max(sample_limit, 1):
+            if record_count <= batch_size:
+                percent = 100.0
+            else:
+                percent = 100.0 * batch_size / record_count
+            # The cap only guards against an unlucky sample; it must not cut
+            # the sample down to the rows stored first
+            queries = [
+                self.get_sample_query(table_name, column, 2 * batch_size, percent)
+                for column in active
+            ]
+            samples = self.fetch_many(queries)
+
+            guessed = self.guess_type_sets(
+                [[str(row[0]).strip() for row in rows] for rows in samples]
+            )
+
+            changed = False
+            still_active = []
+            for column, rows, types in zip(active, samples, guessed):
+                type_sets[column].update(types)
+                new_type = self._determine_final_type(type_sets[column])
+                if new_type == final_types.get(column):
+                    stable_rounds[column] += 1
+                else:
+                    stable_rounds[column] = 0
+                    changed = True
+                final_types[column] = new_type
+
+                if (
+                    percent < 100
+                    and new_type != self.default_data_type
+                    and stable_rounds[column] < self.sample_stable_rounds
+                ):
+                    still_active.append(column)
+
+            sampled += batch_size
+            if changed:
+                batch_size *= 2
+            active = still_active
+
+        print(f"Sampled up to {sampled} records of {table_name} for type detection")
+        return {
+            column: final_types.get(column, self.default_data_type)
+            for column in column_list
+        }
+
+    def _next_wider_type(self, data_type: str) -> str:
+        """Get the type to retry with when casting to data_type fails"""
+        widening = {
+            "smallint": "integer",
+            "integer": "bigint",
+            "bigint": "numeric",
+            "date": "timestamp",
+        }
+        return widening.get(data_type, self.default_data_type)
+
+    def apply_column_type(self, table_name: str, column: str, data_type: str) -> str:
+        """Alter a column, widening the type until the cast succeeds"""
+        while data_type != self.default_data_type:
+            alter_query = self.get_alter_column_syntax(table_name, column, data_type)
+            try:
+                self.execute_query(alter_query)
+                logging.debug(f"Altered column {column} to {data_type}")
+                return data_type
+            except Exception as e:
+                wider_type = self._next_wider_type(data_type)
+                logging.warning(
+                    f"Alter column {column} to {data_type} failed, retrying as "
+                    f"{wider_type}: {e}",
+                    extra={"table": table_name, "column": column},
+                )
+                data_type = wider_type
+        return data_type
 
     def alter_column(self, table_schema: str, table_name: str):
         """Alter column types based on data analysis"""
         db_table = f"{table_name}_build"
-        record_count = self.get_record_count(table_schema, db_table)
-
-        if record_count > 10000:
-            limit_count = 1000
-        elif record_count > 5000:
-            limit_count = 500
-        elif record_count > 1000:
-            limit_count = 500
-        else:
-            limit_count = record_count
-
-        print(f"Analyzing {limit_count} records for type detection")
+        record_count = self.load_counts.get(table_name)
+        if record_count is None:
+            record_count = self.get_catalog_record_counts(
+                table_schema, [db_table]
+            ).get(db_table, 0)
 
         columns_query = self.get_columns_query(db_table, table_schema)
         column_list = self.get_return_list(columns_query)
 
         tmp_table = f"{table_schema}.{db_table}"
-        for column in column_list:
-            query = f"SELECT {column} FROM {tmp_table} WHERE {column} IS NOT NULL LIMIT {limit_count};"
-            value_list = self.get_return_list(query)
-
-            column_types = [self.guess_type(str(value).strip()) for value in value_list]
-            unique_types = set(column_types)
+        known_types = self.known_column_types.get(table_name, {})
+        infer_columns = [column for column in column_list if column not in known_types]
+        column_types = {
+            column: data_type
+            for column, data_type in known_types.items()
+            if column in column_list
+        }
+        if infer_columns:
+            column_types.update(
+                self.infer_column_types(tmp_table, infer_columns, record_count)
+            )
 
-            final_type = self._determine_final_type(unique_types)
-            print(f"Column {column}: {final_type}")
+        applied = {}
+        for column in column_list:
+            final_type = column_types[column]
+            logging.debug(f"Column {column}: {final_type}")
 
             if final_type != self.default_data_type:
-                alter_query = self.get_alter_column_syntax(
-                    tmp_table, column, final_type
-                )
-                try:
-                    self.execute_query(alter_query)
-                    print(f"Altered column {column} to {final_type}")
-                except Exception as e:
-                    print(f"Alter column error: {e}")
-                    continue
+                final_type = self.apply_column_type(tmp_table, column, final_type)
+            applied[column] = final_type
+        self.applied_types[table_name] = applied
+        typed = sum(1 for t in applied.values() if t != self.default_data_type)
+        print(f"Altered {typed} of {len(applied)} columns of {tmp_table}")
+        logging.info(
+            f"Altered {typed} of {len(applied)} columns of {tmp_table}",
+            extra={"table": table_name, "column_types": applied},
+        )
 
     def _determine_final_type(self, type_set):
         """Determine final column type from set of detected types"""
@@ -337,40 +500,313 @@ class DatabaseETL(ABC):
                 file_location, csv_file, history_folder, date_time_str
             )
 
+    def fetch_many(self, queries: List[str]) -> List[List[Any]]:
+        """Fetch results for several independent queries"""
+        return [self.fetch_results(query) for query in queries]
+
+    def for_each_table(self, func: Callable[[str], Any], file_list: List[str]):
+        """Apply a per-file pipeline step to every file in the list"""
+        for csv_file in file_list:
+            func(csv_file)
+
+    def execute_parallel(
+        self,
+        queries: List[str],
+        max_workers: int = 4,
+        groups: Optional[List[str]] = None,
+        group_limits: Optional[Dict[str, int]] = None,
+    ) -> List[Tuple[str, float, Optional[str]]]:
+        """Execute independent statements, return (query, seconds, error) for each.
+
+        groups names the group (table) of each query; at most
+        group_limits[group] queries of a group run at once, besides the
+        overall max_workers. This implementation runs them one at a time.
+        """
+        timings = []
+        for query in queries:
+            start = time.time()
+            try:
+                self.execute_query(query)
+                error = None
+            except Exception as e:
+                error = str(e)
+            timings.append((query, time.time() - start, error))
+        return timings
+
+    def build_table_indexes(
+        self,
+        file_list: List[str],
+        table_schema: str,
+        index_config: Dict[str, List[str]],
+        parallelism: Optional[Dict[str, int]] = None,
+        max_workers: int = 4,
+    ):
+        """Build configured indexes and refresh statistics on the _build tables"""
+        parallelism = parallelism or {}
+        index_queries = []
+        index_tables = []
+        analyze_queries = []
+        for csv_file in file_list:
+            table_name = csv_file.replace(".csv", "").lower()
+            full_table_build = f"{table_schema}.{table_name}_build"
+            for index_spec in index_config.get(table_name, []):
+                columns = [column.strip() for column in index_spec.split(",")]
+                index_name = f"{table_name}_build_{'_'.join(columns)}_idx"[:63]
+                query = self.get_create_index_syntax(
+                    full_table_build, index_name, columns
+                )
+                if query:
+                    index_queries.append(query)
+                    index_tables.append(table_name)
+            analyze_queries.append(self.get_analyze_syntax(full_table_build))
+
+        # Index builds of all tables share one pool; parallelism caps each table
+        timings = self.execute_parallel(
+            index_queries,
+            max_workers,
+            index_tables,
+            {table: parallelism.get(table, max_workers) for table in index_tables},
+        )
+        timings += self.execute_parallel(analyze_queries, max_workers)
+        for query, seconds, error in timings:
+            if error:
+                print(f"Index/statistics error ({seconds:.2f}s): {query} {error}")
+                logging.error(f"Index/statistics error: {query} {error}")
+            else:
+                print(f"Built in {seconds:.2f}s: {query}")
+                logging.info(f"Built in {seconds:.2f}s: {query}")
+
     def create_empty_tables(
         self, file_list: List[str], file_location: str, table_schema: str
     ):
         """Create empty tables for all CSV files"""
-        for csv_file in file_list:
+
+        def create_one(csv_file: str):
             table_name = csv_file.replace(".csv", "").lower()
             full_table_build = f"{table_schema}.{table_name}_build"
             file_path = os.path.join(file_location, csv_file)
             logging.info(f"Creating empty table {full_table_build}")
             self.create_table(file_path, full_table_build)
 
+        self.for_each_table(create_one, file_list)
+
     def alter_tables_column(self, file_list: List[str], table_schema: str):
         """Alter column types for all tables"""
-        for csv_file in file_list:
+
+        def alter_one(csv_file: str):
             table_name = csv_file.replace(".csv", "").lower()
             logging.info(f"Altering columns for {table_schema}.{table_name}")
             self.alter_column(table_schema, table_name)
 
+        self.for_each_table(alter_one, file_list)
+
     def switch_tables_name(self, file_list: List[str], table_schema: str):
         """Switch all build tables to production"""
-        for csv_file in file_list:
+
+        def switch_one(csv_file: str):
             table_name = csv_file.replace(".csv", "").lower()
             logging.info(f"Switching table {table_schema}.{table_name}")
             self.switch_db_table(table_schema, table_name)
 
+        self.for_each_table(switch_one, file_list)
+
+    def get_diff_query(
+        self, build_table: str, prod_table: str, columns: List[str]
+    ) -> str:
+        """Row count, non-null count and checksum per column of both tables"""
+        aggregates = "".join(
+            f", COUNT({column}), {self.get_checksum_aggregate(column)}"
+            for column in columns
+        )
+        return (
+            f"SELECT 'build', COUNT(*){aggregates} FROM {build_table} "
+            f"UNION ALL SELECT 'prod', COUNT(*){aggregates} FROM {prod_table};"
+        )
+
+    def diff_table(self, table_schema: str, table_name: str) -> Optional[Dict[str, Any]]:
+        """Compare a _build table with the production table in one scan of each.
+
+        Returns None when there is no production table, and a dict with an
+        "error" key when the diff query fails.
+        """
+        if not self.is_table_exist(table_name, table_schema):
+            return None
+        build_columns = self.get_return_list(
+            self.get_columns_query(f"{table_name}_build", table_schema)
+        )
+        prod_columns = self.get_return_list(
+            self.get_columns_query(table_name, table_schema)
+        )
+        columns = [column for column in build_columns if column in prod_columns]
+        query = self.get_diff_query(
+            f"{table_schema}.{table_name}_build",
+            f"{table_schema}.{table_name}",
+            columns,
+        )
+        results = {row[0]: row[1:] for row in self.fetch_results(query)}
+        if set(results) != {"build", "prod"}:
+            return {"table": table_name, "error": "diff query failed"}
+        build, prod = results["build"], results["prod"]
+
+        build_rows, prod_rows = int(build[0]), int(prod[0])
+        changed_columns = []
+        null_changes = {}
+        for i, column in enumerate(columns):
+            build_filled, build_sum = build[1 + 2 * i], build[2 + 2 * i]
+            prod_filled, prod_sum = prod[1 + 2 * i], prod[2 + 2 * i]
+            if (build_filled, build_sum) != (prod_filled, prod_sum):
+                changed_columns.append(column)
+            # Shares of an empty table are no baseline either
+            if build_rows and prod_rows:
+                null_changes[column] = abs(
+                    build_filled / build_rows - prod_filled / prod_rows
+                )
+        return {
+            "table": table_name,
+            "build_rows": build_rows,
+            "prod_rows": prod_rows,
+            # An empty production table is no baseline to compare against
+            "row_change": abs(build_rows - prod_rows) / prod_rows if prod_rows else None,
+            "columns": columns,
+            "changed_columns": changed_columns,
+            "null_changes": null_changes,
+            "added_columns": [c for c in build_columns if c not in prod_columns],
+            "dropped_columns": [c for c in prod_columns if c not in build_columns],
+        }
+
+    def diff_tables(
+        self,
+        file_list: List[str],
+        table_schema: str,
+        thresholds: Dict[str, Dict[str, Optional[float]]],
+        accepted: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Report changes of every _build table, return files whose swap is refused.
+
+        Tables whose load or diff query failed are always refused; tables in
+        accepted are switched even when their diff exceeds the thresholds.
+        """
+        accepted = accepted or []
+        refused = []
+
+        def diff_one(csv_file: str):
+            table_name = csv_file.replace(".csv", "").lower()
+            if table_name not in self.load_counts:
+                refused.append(csv_file)
+                message = (
+                    f"Refusing to switch {table_schema}.{table_name}: load failed; "
+                    f"{table_name}_build kept for inspection"
+                )
+                print(message)
+                logging.error(message)
+                return
+            diff = self.diff_table(table_schema, table_name)
+            if diff is None:
+                return
+            if "error" in diff:
+                refused.append(csv_file)
+                message = (
+                    f"Refusing to switch {table_schema}.{table_name}: "
+                    f"{diff['error']}; {table_name}_build kept for inspection"
+                )
+                print(message)
+                logging.error(message)
+                return
+            limits = thresholds.get(table_name, {})
+            max_row_change = limits.get("max_row_change")
+            max_null_change = limits.get("max_null_change")
+            reasons = []
+            if (
+                max_row_change is not None
+                and diff["row_change"] is not None
+                and diff["row_change"] > max_row_change
+            ):
+                reasons.append(
+                    f"row count {diff['prod_rows']} -> {diff['build_rows']}"
+                )
+            if max_null_change is not None:
+                reasons.extend(
+                    f"non-null share of {column} moved by {change:.0%}"
+                    for column, change in diff["null_changes"].items()
+                    if change > max_null_change
+                )
+
+            row_change = (
+                "no baseline"
+                if diff["row_change"] is None
+                else f"{diff['row_change']:.1%}"
+            )
+            line = (
+                f"Diff {table_schema}.{table_name}: rows {diff['prod_rows']} -> "
+                f"{diff['build_rows']} ({row_change}), "
+                f"{len(diff['changed_columns'])} of {len(diff['columns'])} "
+                f"columns changed"
+            )
+            if diff["added_columns"] or diff["dropped_columns"]:
+                line += (
+                    f", added {diff['added_columns']}, dropped {diff['dropped_columns']}"
+                )
+            print(line)
+            logging.info(line, extra={"diff": diff})
+            if reasons and table_name in accepted:
+                message = (
+                    f"Switching {table_schema}.{table_name} despite "
+                    f"{'; '.join(reasons)} (--accept-diff)"
+                )
+                print(message)
+                logging.warning(message)
+            elif reasons:
+                refused.append(csv_file)
+                message = (
+                    f"Refusing to switch {table_schema}.{table_name}: "
+                    f"{'; '.join(reasons)}; {table_name}_build kept for inspection"
+                )
+                print(message)
+                logging.error(message)
+
+        self.for_each_table(diff_one, file_list)
+        return refused
+
     def get_tables_record_count(self, file_list: List[str], table_schema: str):
         """Get record counts for all tables"""
-        for csv_file in file_list:
-            table_name = csv_file.replace(".csv", "").lower()
-            count = self.get_record_count(table_schema, table_name)
+        table_names = [csv_file.replace(".csv", "").lower() for csv_file in file_list]
+        missing = [name for name in table_names if name not in self.load_counts]
+        catalog_counts = self.get_catalog_record_counts(table_schema, missing)
+
+        for table_name in table_names:
+            count = self.load_counts.get(table_name, catalog_counts.get(table_name, 0))
             full_name = f"{table_schema}.{table_name}"
             print(f"Record count of table {full_name} is {count}")
             logging.info(f"Record count of table {full_name} is {count}")
 
+    def reconcile_load_counts(
+        self, file_list: List[str], file_location: str, table_schema: str
+    ) -> List[str]:
+        """Compare loaded row counts against source line counts, return mismatches"""
+        mismatched = []
+        print("Load reconciliation report")
+        for csv_file in file_list:
+            table_name = csv_file.replace(".csv", "").lower()
+            full_name = f"{table_schema}.{table_name}"
+            source_count = count_source_rows(os.path.join(file_location, csv_file))
+            loaded_count = self.load_counts.get(table_name)
+
+            if loaded_count is None:
+                status = "NOT LOADED"
+            elif loaded_count != source_count:
+                status = "MISMATCH"
+            else:
+                status = "OK"
+
+            line = f"{full_name}: source={source_count} loaded={loaded_count} {status}"
+            print(line)
+            if status == "OK":
+                logging.info(line)
+            else:
+                logging.warning(line)
+                mismatched.append(table_name)
+        return mismatched
+
 
 class PostgreSQLETL(DatabaseETL):
     """PostgreSQL implementation of DatabaseETL"""
@@ -378,14 +814,16 @@ class PostgreSQLETL(DatabaseETL):
     def __init__(self, config_file: str = "config.json"):
         super().__init__(config_file)
         self.default_data_type = "text"
+        self.copy_format = transforms.POSTGRESQL_FORMAT
+        self.engine = None
 
     def get_db_connection(self):
         """Establish PostgreSQL connection using SQLAlchemy"""
         with open(self.config_file) as f:
             config = json.load(f)
             connection_uri = config["connection_uri"]
-        engine = sa.create_engine(connection_uri)
-        self.connection = engine.connect()
+        self.engine = sa.create_engine(connection_uri)
+        self.connection = self.engine.connect()
         return self.connection
 
     def execute_query(self, query: str, params: Optional[Any] = None):
@@ -395,7 +833,7 @@ class PostgreSQLETL(DatabaseETL):
                 self.connection.execute(sa.text(query), params)
             else:
                 self.connection.execute(sa.text(query))
-        except exc.SQLAlchemyError as e:
+        except sa.exc.SQLAlchemyError as e:
             raise e
 
     def fetch_results(self, query: str) -> List[Any]:
@@ -403,10 +841,56 @@ class PostgreSQLETL(DatabaseETL):
         try:
             result = list(self.connection.execute(sa.text(query)))
             return result
-        except exc.SQLAlchemyError as e:
+        except sa.exc.SQLAlchemyError as e:
             print(f"Query error: {e}")
             return []
 
+    def execute_parallel(
+        self,
+        queries: List[str],
+        max_workers: int = 4,
+        groups: Optional[List[str]] = None,
+        group_limits: Optional[Dict[str, int]] = None,
+    ) -> List[Tuple[str, float, Optional[str]]]:
+        """Execute independent statements on separate pooled connections"""
+        groups = groups or [None] * len(queries)
+        semaphores = {
+            group: threading.Semaphore(max(limit, 1))
+            for group, limit in (group_limits or {}).items()
+        }
+
+        def run_one(query: str, group: Optional[str]) -> Tuple[str, float, Optional[str]]:
+            with semaphores.get(group, nullcontext()):
+                start = time.time()
+                try:
+                    with self.engine.begin() as conn:
+                        conn.execute(sa.text(query))
+                    return query, time.time() - start, None
+                except sa.exc.SQLAlchemyError as e:
+                    return query, time.time() - start, str(e)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run_one, queries, groups))
+
+    def switch_db_table(self, table_schema: str, table_name: str):
+        """Switch build table to production table, renaming its indexes too"""
+        super().switch_db_table(table_schema, table_name)
+        build_prefix = f"{table_name}_build_"
+        like_pattern = build_prefix.replace("_", "\\_") + "%"
+        index_query = f"""
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = '{table_schema}' AND tablename = '{table_name}'
+            AND indexname LIKE '{like_pattern}'
+        """
+        for index_name in self.get_return_list(index_query):
+            new_name = f"{table_name}_{index_name[len(build_prefix):]}"
+            try:
+                self.execute_query(
+                    f"ALTER INDEX {table_schema}.{index_name} RENAME TO {new_name};"
+                )
+            except Exception as e:
+                print(f"Rename index error: {e}")
+
     def get_table_exists_query(self, table_name: str, schema: str) -> str:
         """PostgreSQL table existence query"""
         full_name = f"{schema}.{table_name}"
@@ -425,6 +909,42 @@ class PostgreSQLETL(DatabaseETL):
         """PostgreSQL ALTER COLUMN syntax"""
         return f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE {data_type} USING {column_name}::{data_type};"
 
+    def get_table_counts_query(self, table_names: List[str], schema: str) -> str:
+        """PostgreSQL live tuple counts from the statistics collector"""
+        names = ",".join(f"'{name}'" for name in table_names)
+        return f"""
+            SELECT relname, n_live_tup FROM pg_stat_user_tables
+            WHERE schemaname = '{schema}' AND relname IN ({names});
+        """
+
+    def get_create_index_syntax(
+        self, table_name: str, index_name: str, columns: List[str]
+    ) -> Optional[str]:
+        """PostgreSQL CREATE INDEX syntax"""
+        return f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)});"
+
+    def get_analyze_syntax(self, table_name: str) -> str:
+        """PostgreSQL ANALYZE syntax"""
+        return f"ANALYZE {table_name};"
+
+    def get_checksum_aggregate(self, column_name: str) -> str:
+        """PostgreSQL text hash summed as numeric, which cannot overflow"""
+        return f"SUM(hashtext({column_name}::text)::numeric)"
+
+    def copy_stream(self, table_name: str, stream) -> int:
+        """PostgreSQL COPY FROM STDIN on a pooled DBAPI connection"""
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.copy_expert(
+                f"COPY {table_name} FROM STDIN WITH (FORMAT csv, HEADER true)", stream
+            )
+            rows = cursor.rowcount
+            raw.commit()
+            return rows
+        finally:
+            raw.close()
+
 
 class VerticaETL(DatabaseETL):
     """Vertica implementation of DatabaseETL"""
@@ -432,9 +952,10 @@ class VerticaETL(DatabaseETL):
     def __init__(self, config_file: str = "config.json"):
         super().__init__(config_file)
         self.default_data_type = "varchar"
+        self.copy_format = transforms.VERTICA_FORMAT
 
-    def get_db_connection(self):
-        """Establish Vertica connection"""
+    def open_connection(self):
+        """Open a new Vertica connection from the config file"""
         if not VERTICA_AVAILABLE:
             raise ImportError("vertica_python package not available")
 
@@ -443,13 +964,17 @@ class VerticaETL(DatabaseETL):
             conn_info["use_prepared_statements"] = True
 
         try:
-            self.connection = vertica_connect(**conn_info)
-            self.cursor = self.connection.cursor()
-            return self.connection
-        except ConnectionError as e:
+            return vertica_python.connect(**conn_info)
+        except vertica_errors.ConnectionError as e:
             print(f"Vertica connection error: {e}")
             raise
 
+    def get_db_connection(self):
+        """Establish Vertica connection"""
+        self.connection = self.open_connection()
+        self.cursor = self.connection.cursor()
+        return self.connection
+
     def execute_query(self, query: str, params: Optional[Any] = None):
         """Execute Vertica query"""
         try:
@@ -458,7 +983,7 @@ class VerticaETL(DatabaseETL):
             else:
                 self.cursor.execute(query)
             self.connection.commit()
-        except (QueryError, MissingSchema) as e:
+        except (vertica_errors.QueryError, vertica_errors.MissingSchema) as e:
             raise e
 
     def fetch_results(self, query: str) -> List[Any]:
@@ -468,7 +993,7 @@ class VerticaETL(DatabaseETL):
             if self.cursor.rowcount == 0:
                 return []
             return self.cursor.fetchall()
-        except QueryError as e:
+        except vertica_errors.QueryError as e:
             print(f"Query error: {e}")
             return []
 
@@ -494,9 +1019,72 @@ class VerticaETL(DatabaseETL):
         """Vertica ALTER COLUMN syntax"""
         return f"ALTER TABLE {table_name} ALTER COLUMN {column_name} SET DATA TYPE {data_type} ALL PROJECTIONS;"
 
+    def get_table_counts_query(self, table_names: List[str], schema: str) -> str:
+        """Vertica row counts from projection storage (largest projection per table)"""
+        names = ",".join(f"'{name}'" for name in table_names)
+        return f"""
+            SELECT anchor_table_name, MAX(row_count) FROM (
+                SELECT anchor_table_name, projection_name, SUM(row_count) AS row_count
+                FROM v_monitor.projection_storage
+                WHERE anchor_table_schema = '{schema}' AND anchor_table_name IN ({names})
+                GROUP BY anchor_table_name, projection_name
+            ) p GROUP BY anchor_table_name;
+        """
+
+    def get_create_index_syntax(
+        self, table_name: str, index_name: str, columns: List[str]
+    ) -> Optional[str]:
+        """Vertica has no indexes; sort order comes from projections"""
+        return None
 
-def create_etl_instance(db_type: str, config_file: str = "config.json") -> DatabaseETL:
+    def get_sample_query(
+        self, table_name: str, column_name: str, limit: int, percent: float
+    ) -> str:
+        """Vertica TABLESAMPLE syntax"""
+        sample = f" TABLESAMPLE({percent:.6f})" if percent < 100 else ""
+        return (
+            f"SELECT {column_name} FROM {table_name}{sample} "
+            f"WHERE {column_name} IS NOT NULL LIMIT {limit};"
+        )
+
+    def get_analyze_syntax(self, table_name: str) -> str:
+        """Vertica ANALYZE_STATISTICS syntax"""
+        return f"SELECT ANALYZE_STATISTICS('{table_name}');"
+
+    def get_checksum_aggregate(self, column_name: str) -> str:
+        """Vertica HASH reduced so the INTEGER sum cannot overflow"""
+        return f"SUM(HASH({column_name}) % {CHECKSUM_MODULUS})"
+
+    def copy_stream(self, table_name: str, stream) -> int:
+        """Vertica COPY FROM STDIN on a dedicated connection"""
+        conn = self.open_connection()
+        try:
+            accepted, _ = vertica_loader.copy_stream(conn, table_name, stream)
+            return accepted
+        finally:
+            conn.close()
+
+
+def create_etl_instance(
+    db_type: str,
+    config_file: str = "config.json",
+    async_io: bool = False,
+    pool_size: int = 8,
+) -> DatabaseETL:
     """Factory function to create appropriate ETL instance"""
+    if db_type.lower() in EMBEDDED_DB_TYPES:
+        from embedded_etl import create_embedded_etl
+
+        return create_embedded_etl(db_type, config_file)
+
+    if async_io:
+        from async_etl import AsyncPostgreSQLETL, AsyncVerticaETL
+
+        if db_type.lower() == "postgresql":
+            return AsyncPostgreSQLETL(config_file, pool_size)
+        elif db_type.lower() == "vertica":
+            return AsyncVerticaETL(config_file, pool_size)
+
     if db_type.lower() == "postgresql":
         return PostgreSQLETL(config_file)
     elif db_type.lower() == "vertica":
@@ -505,9 +1093,59 @@ def create_etl_instance(db_type: str, config_file: str = "config.json") -> Datab
         raise ValueError(f"Unsupported database type: {db_type}")
 
 
+def count_source_rows(file_path: str) -> int:
+    """Count data records in a CSV file (excluding the header).
+
+    Lines are counted without parsing unless the file contains quotes, since
+    a quoted field may span several lines; then records are counted with
+    csv.reader.
+    """
+    lines = 0
+    last_chunk = b""
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            if b'"' in chunk:
+                break
+            lines += chunk.count(b"\n")
+            last_chunk = chunk
+        else:
+            if last_chunk and not last_chunk.endswith(b"\n"):
+                lines += 1
+            return max(lines - 1, 0)
+
+    with open(file_path, encoding="utf-8", newline="") as f:
+        records = sum(1 for row in csv.reader(f) if row)
+    return max(records - 1, 0)
+
+
+def parse_copy_output(output: str) -> Dict[str, int]:
+    """Parse psql/vsql output of a COPY script into rows loaded per table.
+
+    Each COPY in the script is preceded by a ``\\echo LOAD <table>`` marker; the
+    first bare row count ("COPY n" in psql, the "Rows Loaded" value in vsql)
+    after a marker belongs to that table.
+    """
+    counts = {}
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("LOAD "):
+            current = line[5:]
+            continue
+        if current:
+            match = re.match(r"^(?:COPY )?(\d+)$", line)
+            if match:
+                counts[current] = int(match.group(1))
+                current = None
+    return counts
+
+
 def batch_load_csv_to_tables_postgresql(
-    file_list: List[str], file_location: str, table_schema: str
-):
+    file_list: List[str],
+    file_location: str,
+    table_schema: str,
+    table_suffix: str = "_build",
+) -> Dict[str, int]:
     """PostgreSQL-specific batch loading using COPY command"""
     sql_file_path = Path.cwd() / "insert.sql"
     if sql_file_path.is_file():
@@ -516,133 +1154,496 @@ def batch_load_csv_to_tables_postgresql(
     with open("insert.sql", "w") as f:
         for csv_file in file_list:
             table_name = csv_file.replace(".csv", "").lower()
-            full_table_build = f"{table_schema}.{table_name}_build"
+            full_table_build = f"{table_schema}.{table_name}{table_suffix}"
             file_path = os.path.join(file_location, csv_file)
             insert_str = f"\\COPY {full_table_build} FROM '{file_path}' WITH DELIMITER ',' CSV HEADER;\n"
             logging.info(f"Batch Load Csv2Table {full_table_build}")
+            f.write(f"\\echo LOAD {table_name}\n")
             f.write(insert_str)
 
     try:
-        return_code = subprocess.Popen("sh psqlCopy.sh", shell=True).wait()
-        print(f"PostgreSQL batch load return code: {return_code}")
+        result = subprocess.run(
+            "sh psqlCopy.sh",
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        print(result.stdout, end="")
+        print(f"PostgreSQL batch load return code: {result.returncode}")
+        return parse_copy_output(result.stdout)
     except Exception as e:
         print(f"PostgreSQL batch load error: {e}")
         logging.error(f"PostgreSQL batch load error: {e}")
+        return {}
 
 
 def batch_load_csv_to_tables_vertica(
-    file_list: List[str], file_location: str, table_schema: str
-):
-    """Vertica-specific batch loading using COPY command"""
-    sql_file = "batch_load_vertica.sql"
-    sql_file_path = Path.cwd() / sql_file
-    if sql_file_path.is_file():
-        sql_file_path.unlink()
+    file_list: List[str],
+    file_location: str,
+    table_schema: str,
+    table_suffix: str = "_build",
+    connect: Optional[Callable] = None,
+    workers: int = 4,
+    transform_specs: Optional[Dict[str, Dict[str, List[str]]]] = None,
+    profile_store: Optional[ProfileStore] = None,
+    shard_sizes: Optional[Dict[str, int]] = None,
+) -> Dict[str, int]:
+    """Vertica-specific batch loading, streaming COPY FROM STDIN in-process"""
+    jobs = []
+    for csv_file in file_list:
+        table_name = csv_file.replace(".csv", "").lower()
+        full_table_build = f"{table_schema}.{table_name}{table_suffix}"
+        file_path = os.path.join(file_location, csv_file)
+        logging.info(f"Batch Load Csv2Table {full_table_build}")
+        jobs.append((full_table_build, table_name, file_path))
+
+    reports = vertica_loader.load_files(
+        jobs,
+        partial(vertica_loader.opened, connect),
+        workers=workers,
+        open_stream=transforms.stream_opener(
+            transform_specs or {},
+            transforms.VERTICA_FORMAT,
+            profile_store,
+            shard_sizes,
+        ),
+    )
+    if vertica_loader.failed_tables(reports):
+        logging.error("Vertica COPY function failed")
+        sys.exit(1)
+    return vertica_loader.accepted_counts(reports)
+
+
+def stream_load_csv_to_tables(
+    etl: DatabaseETL,
+    file_list: List[str],
+    file_location: str,
+    table_schema: str,
+    table_suffix: str = "_build",
+    transform_specs: Optional[Dict[str, Dict[str, List[str]]]] = None,
+    workers: int = 4,
+    profile_store: Optional[ProfileStore] = None,
+) -> Dict[str, int]:
+    """Load CSV files through the streaming transform stage into COPY FROM STDIN"""
+    transform_specs = transform_specs or {}
+
+    def load_one(csv_file: str) -> Tuple[str, Optional[int]]:
+        table_name = csv_file.replace(".csv", "").lower()
+        full_table_build = f"{table_schema}.{table_name}{table_suffix}"
+        file_path = os.path.join(file_location, csv_file)
+        logging.info(f"Stream Load Csv2Table {full_table_build}")
+        progress = ProgressReporter(f"Stream load {full_table_build}")
+        stream = transforms.open_transformed(
+            file_path,
+            transform_specs.get(table_name, {}),
+            etl.copy_format,
+            profile_store.profiler(table_name) if profile_store else None,
+            progress,
+            etl.shard_sizes.get(table_name),
+        )
+        try:
+            return table_name, etl.copy_stream(full_table_build, stream)
+        except Exception as e:
+            print(f"Stream load error for {full_table_build}: {e}")
+            logging.error(f"Stream load error for {full_table_build}: {e}")
+            return table_name, None
+        finally:
+            stream.close()
+            progress.done()
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = list(executor.map(load_one, file_list))
+    return {table_name: rows for table_name, rows in results if rows is not None}
+
+
+def batch_load_csv_to_tables_embedded(
+    etl: DatabaseETL,
+    file_list: List[str],
+    file_location: str,
+    table_schema: str,
+    table_suffix: str = "_build",
+    transform_specs: Optional[Dict[str, Dict[str, List[str]]]] = None,
+    profile_store: Optional[ProfileStore] = None,
+) -> Dict[str, int]:
+    """Embedded batch loading with the engine's native CSV reader"""
+    transform_specs = transform_specs or {}
+    # One writer at a time: the embedded connection is serialized
+    streamed = [
+        f
+        for f in file_list
+        if profile_store is not None or table_name_of(f) in transform_specs
+    ]
+    counts = stream_load_csv_to_tables(
+        etl,
+        streamed,
+        file_location,
+        table_schema,
+        table_suffix,
+        transform_specs,
+        1,
+        profile_store,
+    )
+    for csv_file in file_list:
+        if csv_file in streamed:
+            continue
+        table_name = table_name_of(csv_file)
+        full_table_build = f"{table_schema}.{table_name}{table_suffix}"
+        logging.info(f"Native Load Csv2Table {full_table_build}")
+        try:
+            counts[table_name] = etl.load_csv_file(
+                full_table_build, os.path.join(file_location, csv_file)
+            )
+        except Exception as e:
+            print(f"Native load error for {full_table_build}: {e}")
+            logging.error(f"Native load error for {full_table_build}: {e}")
+    return counts
+
+
+def batch_load_csv_to_tables(
+    etl: DatabaseETL,
+    db_type: str,
+    file_list: List[str],
+    file_location: str,
+    table_schema: str,
+    table_suffix: str = "_build",
+    workers: int = 4,
+    transform_specs: Optional[Dict[str, Dict[str, List[str]]]] = None,
+    profile_store: Optional[ProfileStore] = None,
+) -> Dict[str, int]:
+    """Load CSV files with the database-specific COPY, return rows per table"""
+    if not file_list:
+        return {}
+    transform_specs = transform_specs or {}
+    if db_type.lower() == "postgresql":
+        # Tables with declared transforms (or every table, when profiling)
+        # are streamed in-process; the rest keep the psql \COPY path
+        streamed = [
+            f
+            for f in file_list
+            if profile_store is not None or table_name_of(f) in transform_specs
+        ]
+        plain = [f for f in file_list if f not in streamed]
+        counts = stream_load_csv_to_tables(
+            etl,
+            streamed,
+            file_location,
+            table_schema,
+            table_suffix,
+            transform_specs,
+            workers,
+            profile_store,
+        )
+        if plain:
+            counts.update(
+                batch_load_csv_to_tables_postgresql(
+                    plain, file_location, table_schema, table_suffix
+                )
+            )
+        return counts
+    elif db_type.lower() == "vertica":
+        return batch_load_csv_to_tables_vertica(
+            file_list,
+            file_location,
+            table_schema,
+            table_suffix,
+            connect=etl.open_connection,
+            workers=workers,
+            transform_specs=transform_specs,
+            profile_store=profile_store,
+            shard_sizes=etl.shard_sizes,
+        )
+    elif db_type.lower() in EMBEDDED_DB_TYPES:
+        return batch_load_csv_to_tables_embedded(
+            etl,
+            file_list,
+            file_location,
+            table_schema,
+            table_suffix,
+            transform_specs,
+            profile_store,
+        )
+    return {}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="PostgreSQL/Vertica ETL pipeline (DuckDB/SQLite for local staging)"
+    )
+    parser.add_argument(
+        "--db-type",
+        default=os.getenv("DB_TYPE", "postgresql"),
+        choices=["postgresql", "vertica", *EMBEDDED_DB_TYPES],
+        help="Target database (default: DB_TYPE or postgresql)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=os.getenv("ETL_MANIFEST", DEFAULT_MANIFEST),
+        help="Pipeline manifest (default: ETL_MANIFEST or manifest.json)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Validate the manifest and inputs and print the schedule, without connecting",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Estimate rows, bytes and phase durations per table without writing anything",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample stacks per phase and time SQL statements, written under profiles/",
+    )
+    parser.add_argument(
+        "--accept-diff",
+        action="append",
+        default=[],
+        metavar="TABLE",
+        help="Switch TABLE even if its diff exceeds the manifest thresholds (repeatable)",
+    )
+    return parser.parse_args(argv)
 
-    with open(sql_file, "w") as f:
-        for csv_file in file_list:
-            table_name = csv_file.replace(".csv", "").lower()
-            full_table_build = f"{table_schema}.{table_name}_build"
-            file_path = os.path.join(file_location, csv_file)
-            insert_str = f"COPY {full_table_build} FROM LOCAL '{file_path}' DELIMITER ',' SKIP 1;\n"
-            logging.info(f"Batch Load Csv2Table {full_table_build}")
-            f.write(insert_str)
 
-    try:
-        return_code = subprocess.Popen("sh batch_load_vertica.sh", shell=True).wait()
-        print(f"Vertica batch load return code: {return_code}")
-        if return_code > 0:
-            logging.error("Vertica COPY function failed")
-            sys.exit(1)
-    except Exception as e:
-        print(f"Vertica batch load error: {e}")
-        logging.error(f"Vertica batch load error: {e}")
+def dry_run(file_list: List[str], file_location: str, manifest) -> int:
+    """Print the scheduled tables and their settings, return exit status"""
+    missing = 0
+    for csv_file in file_list:
+        path = os.path.join(file_location, csv_file)
+        spec = manifest.table(csv_file)
+        if os.path.exists(path):
+            size = f"{os.path.getsize(path)} bytes"
+        else:
+            size = "MISSING"
+            missing += 1
+        print(
+            f"{table_name_of(csv_file)}: {size}, load={spec['load']}, "
+            f"priority={spec['priority']}, parallelism={spec['parallelism']}"
+        )
+    return 1 if missing else 0
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Main execution function"""
-    logging.basicConfig(
-        level=logging.INFO,
-        filename="output.log",
-        format="%(asctime)s :: %(levelname)s :: %(name)s :: Line No %(lineno)d :: %(message)s",
-    )
+    args = parse_args(argv)
 
     # Configuration
-    db_type = os.getenv("DB_TYPE", "postgresql")  # Default to PostgreSQL
-    file_location = "./input/"
-    history_folder = "./history"
-    table_schema = "schema_hi"
+    db_type = args.db_type
+    async_io = os.getenv("ETL_ASYNC", "0") == "1"
+    pool_size = int(os.getenv("ETL_POOL_SIZE", "8"))
+    manifest = load_manifest(args.manifest)
+    file_location = manifest.get("input_dir", "./input/")
+    history_folder = manifest.get("history_dir", "./history")
+    table_schema = manifest.get("schema", "schema_hi")
+    config_file = "config.json"
 
     # Validate directories
     if not Path(file_location).exists():
         print(f"No such directory: {file_location}")
         sys.exit(1)
 
+    # Get file list
+    if db_type.lower() == "vertica" and Path("files.list").exists():
+        # Vertica version reads from files.list
+        file_list = []
+        with open("files.list") as f:
+            for line in f:
+                file_list.append(line.strip())
+    else:
+        file_list = manifest.file_list()
+    file_list = manifest.schedule(file_list, file_location)
+
+    if args.dry_run:
+        sys.exit(dry_run(file_list, file_location, manifest))
+
+    if args.plan:
+        # Read-only: the catalog is only queried for current row counts.
+        # Embedded databases are files that connecting would create
+        catalog_counts = {}
+        if db_type.lower() not in EMBEDDED_DB_TYPES:
+            try:
+                etl = create_etl_instance(db_type, config_file)
+                etl.get_db_connection()
+                catalog_counts = etl.get_catalog_record_counts(
+                    table_schema, [table_name_of(csv_file) for csv_file in file_list]
+                )
+                etl.close_connection()
+            except Exception as e:
+                print(f"Catalog unavailable, planning from input files only: {e}")
+        # Same worker count as the load phase below: embedded loads are
+        # serialized, and psql runs one \COPY script unless tables are streamed
+        streamed = manifest.get("profile_store") or any(
+            table_name_of(csv_file) in manifest.transforms() for csv_file in file_list
+        )
+        if db_type.lower() in EMBEDDED_DB_TYPES:
+            load_workers = 1
+        elif db_type.lower() == "postgresql" and not streamed:
+            load_workers = 1
+        else:
+            load_workers = pool_size
+        plan = build_plan(
+            "load_tables_daily",
+            file_list,
+            file_location,
+            PIPELINE_PHASES,
+            pool_size if async_io else 1,
+            catalog_counts,
+            phase_parallelism={"load": load_workers},
+        )
+        print_plan(plan)
+        sys.exit(0)
+
     if not Path(history_folder).exists():
         print(f"No such directory: {history_folder}")
         sys.exit(1)
 
+    listener = setup_logging(
+        "output.log",
+        "%(asctime)s :: %(levelname)s :: %(name)s :: Line No %(lineno)d :: %(message)s",
+    )
+
+    profiler = RunProfiler("load_tables_daily") if args.profile else None
+    if profiler is not None:
+        profiler.ignore_thread(listener._thread)
+        profiler.start()
+
     # Create ETL instance
     try:
-        etl = create_etl_instance(db_type)
+        etl = create_etl_instance(
+            db_type, config_file, async_io=async_io, pool_size=pool_size
+        )
         etl.get_db_connection()
+        etl.prepare_schema(table_schema)
     except Exception as e:
         print(f"Failed to create ETL instance: {e}")
         sys.exit(1)
-
-    # Get file list
-    if db_type.lower() == "vertica" and Path("files.list").exists():
-        # Vertica version reads from files.list
-        file_list = []
-        with open("files.list") as f:
-            for line in f:
-                file_list.append(line.strip())
-    else:
-        # PostgreSQL version uses hardcoded list
-        file_list = [
-            "PH_D_Person_Race.csv",
-            "PH_D_Person.csv",
-            "PH_F_Claim.csv",
-            "PH_D_Person_Alias.csv",
-            "PH_D_Person_Demographics.csv",
-            "PH_F_Encounter.csv",
-            "PH_F_Encounter_Benefit_Coverage.csv",
-            "PH_F_Encounter_Location.csv",
-            "PH_F_Medication.csv",
-            "PH_F_Procedure.csv",
-            "PH_F_Condition.csv",
-            "PH_F_Result.csv",
-            "EMPI_ID_Observation_Period.csv",
-            "Map_Between_Claim_Id_Encounter_Id.csv",
-            "recent_documents_titles.csv",
-            "recent_enc_with_documents.csv",
-            "recent_rad_documents_titles.csv",
-            "pui_mapped_mrns_to_empi_id.csv",
-            "map2_condition_occurrence_with_ccs.csv",
-            "hi_care_site.csv",
-            "med_admin.csv",
-            "med_admin_ingred.csv",
-        ]
-
+    if profiler is not None:
+        profiler.instrument(etl)
+        profiler.instrument_loader(vertica_loader)
+
+    sampling = manifest.get("sampling", {})
+    etl.sample_initial = sampling.get("initial", etl.sample_initial)
+    etl.sample_max = sampling.get("max", etl.sample_max)
+    etl.sample_stable_rounds = sampling.get("stable_rounds", etl.sample_stable_rounds)
+    etl.inference_workers = sampling.get("workers", etl.inference_workers)
+    etl.known_column_types = manifest.column_types()
+    etl.shard_sizes = manifest.shard_sizes()
+    profile_path = manifest.get("profile_store")
+    profile_store = ProfileStore(profile_path) if profile_path else None
+
+    # Delta tables append to the production table once it exists
+    delta_files = [
+        csv_file
+        for csv_file in manifest.files_with_load(file_list, "delta")
+        if etl.is_table_exist(table_name_of(csv_file), table_schema)
+    ]
+    full_files = [csv_file for csv_file in file_list if csv_file not in delta_files]
+
+    metrics = RunMetrics("load_tables_daily")
+    metrics.profiler = profiler
     try:
         # Execute ETL pipeline
-        etl.backup_csv_files(file_list, file_location, history_folder)
-        etl.create_empty_tables(file_list, file_location, table_schema)
+        with metrics.phase("backup"):
+            etl.backup_csv_files(file_list, file_location, history_folder)
+        with metrics.phase("create"):
+            etl.create_empty_tables(full_files, file_location, table_schema)
 
         # Database-specific batch loading
-        if db_type.lower() == "postgresql":
-            batch_load_csv_to_tables_postgresql(file_list, file_location, table_schema)
-        elif db_type.lower() == "vertica":
-            batch_load_csv_to_tables_vertica(file_list, file_location, table_schema)
+        with metrics.phase("load"):
+            etl.load_counts.update(
+                batch_load_csv_to_tables(
+                    etl,
+                    db_type,
+                    full_files,
+                    file_location,
+                    table_schema,
+                    workers=pool_size,
+                    transform_specs=manifest.transforms(),
+                    profile_store=profile_store,
+                )
+            )
+            etl.load_counts.update(
+                batch_load_csv_to_tables(
+                    etl,
+                    db_type,
+                    delta_files,
+                    file_location,
+                    table_schema,
+                    table_suffix="",
+                    workers=pool_size,
+                    transform_specs=manifest.transforms(),
+                    profile_store=profile_store,
+                )
+            )
+        etl.reconcile_load_counts(file_list, file_location, table_schema)
+        for csv_file in file_list:
+            metrics.add_table(
+                table_name_of(csv_file),
+                os.path.join(file_location, csv_file),
+                etl.load_counts.get(table_name_of(csv_file)),
+            )
+        # Delta load counts are rows appended, not table sizes
+        for csv_file in delta_files:
+            etl.load_counts.pop(table_name_of(csv_file), None)
+
+        if profile_store is not None:
+            # Reuse last run's types for columns whose data has not drifted
+            full_tables = [table_name_of(csv_file) for csv_file in full_files]
+            profile_store.report_drift(full_tables)
+            for table_name in full_tables:
+                known_types = profile_store.known_types(table_name)
+                known_types.update(etl.known_column_types.get(table_name, {}))
+                if known_types:
+                    etl.known_column_types[table_name] = known_types
 
         # Common operations
-        etl.alter_tables_column(file_list, table_schema)
-        etl.switch_tables_name(file_list, table_schema)
+        with metrics.phase("alter"):
+            etl.alter_tables_column(full_files, table_schema)
+        with metrics.phase("index"):
+            etl.build_table_indexes(
+                full_files, table_schema, manifest.index_config(), manifest.parallelism()
+            )
+        with metrics.phase("diff"):
+            refused = etl.diff_tables(
+                full_files,
+                table_schema,
+                manifest.diff_thresholds(full_files),
+                [table_name_of(table) for table in args.accept_diff],
+            )
+        with metrics.phase("switch"):
+            etl.switch_tables_name(
+                [csv_file for csv_file in full_files if csv_file not in refused],
+                table_schema,
+            )
+        # Refused tables keep serving the previous load
+        for csv_file in refused:
+            etl.load_counts.pop(table_name_of(csv_file), None)
         etl.get_tables_record_count(file_list, table_schema)
 
+        if profile_store is not None:
+            for table_name, column_types in etl.applied_types.items():
+                profile_store.record_types(table_name, column_types)
+            profile_store.save(
+                [
+                    table_name_of(csv_file)
+                    for csv_file in file_list
+                    if csv_file not in refused
+                ],
+                appended=[table_name_of(csv_file) for csv_file in delta_files],
+            )
+
     finally:
+        etl.close_inference_pool()
         etl.close_connection()
-
+        if profiler is not None:
+            profiler.stop()
+            profiler.write()
+
+    metrics.save()
+    if refused:
+        print(f"Switch refused for {len(refused)} table(s): {', '.join(refused)}")
+        sys.exit(2)
     print("ETL pipeline completed successfully!")
 
 
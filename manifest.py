@@ -0,0 +1,162 @@
+"""
+Declarative pipeline manifest
+
+manifest.json replaces the hard-coded file list and constants of
+load_tables_daily.py and the per-mode schemas and paths of vertica_upload.py.
+
+Top-level keys:
+
+* schema, input_dir, history_dir: load_tables_daily.py settings
+* sampling: initial, max and stable_rounds for adaptive type inference,
+  workers for the type-guessing process pool (default: CPU count)
+* profile_store: column profile file (see profiles.py), off unless set.
+  Profiling streams every table through the in-process loader instead of
+  native COPY, which is far slower on large files
+* defaults: per-table settings applied when a table does not override them
+* modes: vertica_upload.py settings per mode (input_dir, pg_schema,
+  v_schema, log_file, history_snapshot: "partition" (default)
+  or "insert")
+* tables: one entry per CSV file
+
+Per-table settings:
+
+* file: CSV file name; the table name is the lower-cased file name
+* load: "full" (build table + swap) or "delta" (append to production table)
+* priority: higher priorities are scheduled first, then bigger files
+* parallelism: concurrent statements for this table (index builds)
+* shard_size: rows the streaming loaders render into COPY per batch
+  (transforms.ROWS_PER_WRITE when unset); bigger batches cut per-call
+  overhead, smaller ones bound memory on wide rows
+* column_types: known column types, skipping type inference for them
+* indexes: index columns, "a,b" for a multi-column index
+* transforms: per-column streaming cleanups applied during the load
+  (see transforms.py), "*" for every column
+* max_row_change: refuse to switch a table whose row count moved by more
+  than this fraction of the production count (null: never refuse; an
+  empty production table is no baseline). --accept-diff TABLE overrides
+* max_null_change: refuse to switch a table when a column's non-null share
+  moved by more than this (null: never refuse; not checked against an
+  empty production table)
+"""
+
+import json
+import os
+from typing import Any, Dict, List
+
+DEFAULT_MANIFEST = "manifest.json"
+
+TABLE_DEFAULTS = {
+    "load": "full",
+    "priority": 0,
+    "parallelism": 4,
+    "shard_size": None,
+    "column_types": {},
+    "indexes": [],
+    "transforms": {},
+    "max_row_change": None,
+    "max_null_change": None,
+}
+
+LOAD_STRATEGIES = ("full", "delta")
+
+
+def table_name_of(csv_file: str) -> str:
+    """Table name for a CSV file, as used throughout the pipeline"""
+    return csv_file.replace(".csv", "").lower()
+
+
+class Manifest:
+    """Pipeline manifest with per-table settings merged over the defaults"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        defaults = dict(TABLE_DEFAULTS)
+        defaults.update(data.get("defaults", {}))
+        self.defaults = defaults
+
+        self.table_specs: Dict[str, Dict[str, Any]] = {}
+        for entry in data.get("tables", []):
+            spec = dict(defaults)
+            spec.update(entry)
+            if spec["load"] not in LOAD_STRATEGIES:
+                raise ValueError(
+                    f"Unknown load strategy {spec['load']} for {entry['file']}"
+                )
+            self.table_specs[table_name_of(entry["file"])] = spec
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def mode(self, name: str) -> Dict[str, Any]:
+        """Settings for a vertica_upload.py mode"""
+        return self.data.get("modes", {}).get(name, {})
+
+    def file_list(self) -> List[str]:
+        """CSV files in manifest order"""
+        return [spec["file"] for spec in self.table_specs.values()]
+
+    def table(self, csv_file: str) -> Dict[str, Any]:
+        """Settings for a CSV file, falling back to the defaults"""
+        table_name = table_name_of(csv_file)
+        spec = self.table_specs.get(table_name)
+        if spec is None:
+            spec = dict(self.defaults)
+            spec["file"] = csv_file
+        return spec
+
+    def schedule(self, file_list: List[str], file_location: str) -> List[str]:
+        """Order files by priority, then biggest first"""
+
+        def sort_key(csv_file: str):
+            path = os.path.join(file_location, csv_file)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            return (-self.table(csv_file)["priority"], -size)
+
+        return sorted(file_list, key=sort_key)
+
+    def files_with_load(self, file_list: List[str], load: str) -> List[str]:
+        """Files whose load strategy is the given one"""
+        return [f for f in file_list if self.table(f)["load"] == load]
+
+    def index_config(self) -> Dict[str, List[str]]:
+        return {name: spec["indexes"] for name, spec in self.table_specs.items()}
+
+    def parallelism(self) -> Dict[str, int]:
+        return {name: spec["parallelism"] for name, spec in self.table_specs.items()}
+
+    def shard_sizes(self) -> Dict[str, int]:
+        return {
+            name: spec["shard_size"]
+            for name, spec in self.table_specs.items()
+            if spec["shard_size"]
+        }
+
+    def transforms(self) -> Dict[str, Dict[str, List[str]]]:
+        return {
+            name: spec["transforms"]
+            for name, spec in self.table_specs.items()
+            if spec["transforms"]
+        }
+
+    def diff_thresholds(self, file_list: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Swap refusal thresholds per table"""
+        return {
+            table_name_of(csv_file): {
+                "max_row_change": self.table(csv_file)["max_row_change"],
+                "max_null_change": self.table(csv_file)["max_null_change"],
+            }
+            for csv_file in file_list
+        }
+
+    def column_types(self) -> Dict[str, Dict[str, str]]:
+        return {
+            name: spec["column_types"]
+            for name, spec in self.table_specs.items()
+            if spec["column_types"]
+        }
+
+
+def load_manifest(path: str = DEFAULT_MANIFEST) -> Manifest:
+    """Read a JSON manifest file"""
+    with open(path) as f:
+        return Manifest(json.load(f))
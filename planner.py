@@ -0,0 +1,220 @@
+"""
+Run metrics history and dry-run load planner
+
+Every pipeline run appends its phase durations and per-table input sizes
+to run_metrics.jsonl. The --plan mode of load_tables_daily.py and
+vertica_upload.py reads that history, scans the input files (and
+optionally the catalog) without writing anything, and prints per-table
+row/byte estimates, expected phase durations and the critical path.
+
+A phase's cost is modelled as seconds per input byte, taken as the median
+over past runs of the same pipeline; DEFAULT_SECONDS_PER_MB is used for
+phases that have no history yet.
+"""
+
+import datetime
+import heapq
+import json
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+METRICS_FILE = "run_metrics.jsonl"
+HISTORY_RUNS = 10
+ROW_SAMPLE_BYTES = 1 << 20
+
+DEFAULT_SECONDS_PER_MB = {
+    "backup": 0.01,
+    "create": 0.005,
+    "load": 0.05,
+    "alter": 0.02,
+    "index": 0.03,
+    "diff": 0.01,
+    "switch": 0.005,
+    "create_tables": 0.005,
+    "bulk_upload": 0.05,
+    "insert_tables": 0.1,
+    "copy2history_table": 0.05,
+}
+
+
+class RunMetrics:
+    """Phase durations and table sizes collected during one run"""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.started = datetime.datetime.now().isoformat(timespec="seconds")
+        self.phases: Dict[str, float] = {}
+        self.tables: Dict[str, Dict[str, int]] = {}
+        # Optional profiling.RunProfiler told about each phase
+        self.profiler = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.time()
+        try:
+            if self.profiler is not None:
+                with self.profiler.phase(name):
+                    yield
+            else:
+                yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.time() - start
+
+    def add_table(self, table_name: str, file_path: str, rows: Optional[int] = None):
+        size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        self.tables[table_name] = {"bytes": size, "rows": rows}
+
+    def save(self, path: str = METRICS_FILE):
+        record = {
+            "pipeline": self.pipeline,
+            "started": self.started,
+            "phases": self.phases,
+            "tables": self.tables,
+        }
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_history(pipeline: str, path: str = METRICS_FILE) -> List[Dict]:
+    """Most recent runs of a pipeline, oldest first"""
+    if not os.path.exists(path):
+        return []
+    runs = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            run = json.loads(line)
+            if run.get("pipeline") == pipeline:
+                runs.append(run)
+    return runs[-HISTORY_RUNS:]
+
+
+def phase_rates(history: List[Dict], phases: List[str]) -> Dict[str, float]:
+    """Seconds per input byte for each phase"""
+    rates = {}
+    for phase in phases:
+        samples = []
+        for run in history:
+            total_bytes = sum(t.get("bytes", 0) for t in run.get("tables", {}).values())
+            if total_bytes and phase in run.get("phases", {}):
+                samples.append(run["phases"][phase] / total_bytes)
+        if samples:
+            rates[phase] = statistics.median(samples)
+        else:
+            rates[phase] = DEFAULT_SECONDS_PER_MB.get(phase, 0.01) / (1 << 20)
+    return rates
+
+
+def estimate_rows(file_path: str) -> int:
+    """Estimate data rows of a CSV file from the line length of its first MB"""
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        head = f.read(ROW_SAMPLE_BYTES)
+    lines = head.count(b"\n")
+    if not lines:
+        return 0
+    if len(head) >= size:
+        return max(lines - 1, 0)
+    return int(size / (len(head) / lines)) - 1
+
+
+def makespan(durations: List[float], workers: int) -> float:
+    """Longest-processing-time-first schedule length on a number of workers"""
+    loads = [0.0] * max(workers, 1)
+    heapq.heapify(loads)
+    for duration in sorted(durations, reverse=True):
+        heapq.heappush(loads, heapq.heappop(loads) + duration)
+    return max(loads)
+
+
+def build_plan(
+    pipeline: str,
+    file_list: List[str],
+    file_location: str,
+    phases: List[str],
+    parallelism: int = 1,
+    catalog_counts: Optional[Dict[str, int]] = None,
+    metrics_file: str = METRICS_FILE,
+    phase_parallelism: Optional[Dict[str, int]] = None,
+) -> Dict:
+    """Estimate per-table and per-phase durations for a run.
+
+    phase_parallelism overrides parallelism for phases that run with their
+    own worker count (the load step's COPY sessions).
+    """
+    phase_parallelism = phase_parallelism or {}
+    history = load_history(pipeline, metrics_file)
+    rates = phase_rates(history, phases)
+    catalog_counts = catalog_counts or {}
+
+    tables = []
+    for csv_file in file_list:
+        table_name = csv_file.replace(".csv", "").lower()
+        path = os.path.join(file_location, csv_file)
+        exists = os.path.exists(path)
+        size = os.path.getsize(path) if exists else 0
+        estimates = {phase: size * rates[phase] for phase in phases}
+        tables.append(
+            {
+                "table": table_name,
+                "bytes": size,
+                "rows": estimate_rows(path) if exists else 0,
+                "current_rows": catalog_counts.get(table_name),
+                "missing": not exists,
+                "phases": estimates,
+                "total": sum(estimates.values()),
+            }
+        )
+
+    phase_plan = []
+    for phase in phases:
+        durations = [t["phases"][phase] for t in tables]
+        longest = max(tables, key=lambda t: t["phases"][phase]) if tables else None
+        phase_plan.append(
+            {
+                "phase": phase,
+                "seconds": makespan(
+                    durations, phase_parallelism.get(phase, parallelism)
+                ),
+                "critical_table": longest["table"] if longest else None,
+            }
+        )
+
+    return {
+        "pipeline": pipeline,
+        "history_runs": len(history),
+        "parallelism": parallelism,
+        "phase_parallelism": phase_parallelism,
+        "tables": sorted(tables, key=lambda t: t["total"], reverse=True),
+        "phases": phase_plan,
+        "total_seconds": sum(p["seconds"] for p in phase_plan),
+    }
+
+
+def print_plan(plan: Dict):
+    """Print an execution plan produced by build_plan"""
+    workers = "".join(
+        f", {phase} {count}" for phase, count in plan["phase_parallelism"].items()
+    )
+    print(
+        f"Execution plan for {plan['pipeline']} "
+        f"({plan['history_runs']} past runs, parallelism {plan['parallelism']}{workers})"
+    )
+    print(f"{'table':<45} {'MB':>9} {'est rows':>12} {'current':>12} {'est s':>9}")
+    for t in plan["tables"]:
+        current = "-" if t["current_rows"] is None else str(t["current_rows"])
+        name = t["table"] + (" (MISSING)" if t["missing"] else "")
+        print(
+            f"{name:<45} {t['bytes'] / (1 << 20):>9.1f} {t['rows']:>12} "
+            f"{current:>12} {t['total']:>9.1f}"
+        )
+    print()
+    print(f"{'phase':<20} {'est s':>9}  critical table")
+    for p in plan["phases"]:
+        print(f"{p['phase']:<20} {p['seconds']:>9.1f}  {p['critical_table']}")
+    print(f"Estimated load window: {plan['total_seconds']:.1f}s")
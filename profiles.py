@@ -0,0 +1,367 @@
+"""
+Cross-run column profile store
+
+Each load keeps per-column statistics computed on the rows as they stream
+into COPY (see transforms.open_transformed), so profiling adds no extra
+scan: row and null counts, min/max, maximum length, a HyperLogLog sketch
+of the distinct values and the type alter_column settled on.
+
+The latest profile of every table is kept in column_profiles.json. On the
+next run the stored types are reused for columns whose statistics have not
+drifted, drift is reported, and distinct counts feed the projection
+advisor. Delta loads merge into the stored profile of the production table.
+"""
+
+import base64
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+PROFILE_FILE = "column_profiles.json"
+HLL_PRECISION = 10
+
+# Drift thresholds between two loads of the same table
+DRIFT_NULL_FRACTION = 0.1
+DRIFT_DISTINCT_RATIO = 2.0
+DRIFT_MIN_DISTINCT = 100
+
+# Value range of the integer types alter_column can settle on
+INTEGER_RANGES = {
+    "smallint": (-32768, 32767),
+    "integer": (-2147483648, 2147483647),
+    "bigint": (-9223372036854775808, 9223372036854775807),
+}
+# Longest value a date column holds without a time part (YYYY-MM-DD)
+DATE_MAX_LENGTH = 10
+
+
+class HyperLogLog:
+    """Distinct-count sketch with 2**precision one-byte registers"""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[bytes] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers or self.size)
+        self._shift = 64 - precision
+        self._mask = (1 << self._shift) - 1
+
+    def add(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> self._shift
+        rank = self._shift - (hashed & self._mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        raw = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * self.size and zeros:
+            return int(round(self.size * math.log(self.size / zeros)))
+        return int(round(raw))
+
+    def dumps(self) -> str:
+        return base64.b64encode(bytes(self.registers)).decode("ascii")
+
+    @classmethod
+    def loads(cls, data: str) -> "HyperLogLog":
+        registers = base64.b64decode(data)
+        return cls(int(math.log2(len(registers))), registers)
+
+
+class ColumnProfile:
+    """Statistics of one column, updated value by value"""
+
+    __slots__ = (
+        "count",
+        "nulls",
+        "min",
+        "max",
+        "numeric_min",
+        "numeric_max",
+        "numeric",
+        "integral",
+        "max_length",
+        "sketch",
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.min: Optional[str] = None
+        self.max: Optional[str] = None
+        self.numeric_min: Optional[float] = None
+        self.numeric_max: Optional[float] = None
+        self.numeric = True
+        self.integral = True
+        self.max_length = 0
+        self.sketch = HyperLogLog()
+
+    def observe(self, value: str):
+        self.count += 1
+        if not value:
+            # COPY loads empty fields as NULL
+            self.nulls += 1
+            return
+        self.sketch.add(value)
+        if len(value) > self.max_length:
+            self.max_length = len(value)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.numeric:
+            try:
+                number = float(value)
+            except ValueError:
+                self.numeric = False
+                return
+            if self.integral:
+                try:
+                    int(value)
+                except ValueError:
+                    self.integral = False
+            if self.numeric_min is None or number < self.numeric_min:
+                self.numeric_min = number
+            if self.numeric_max is None or number > self.numeric_max:
+                self.numeric_max = number
+
+    def to_dict(self) -> Dict:
+        numeric = self.numeric and self.numeric_min is not None
+        return {
+            "count": self.count,
+            "nulls": self.nulls,
+            "null_fraction": self.nulls / self.count if self.count else 0.0,
+            "min": self.numeric_min if numeric else self.min,
+            "max": self.numeric_max if numeric else self.max,
+            "numeric": numeric,
+            "integral": numeric and self.integral,
+            "max_length": self.max_length,
+            "distinct": self.sketch.estimate(),
+            "hll": self.sketch.dumps(),
+        }
+
+
+class TableProfile:
+    """Column profiles of one table, filled from a row stream"""
+
+    def __init__(self, header: List[str]):
+        self.header = header
+        self.rows = 0
+        self.columns = [ColumnProfile() for _ in header]
+
+    def observe(self, rows: Iterable[List[str]]) -> Iterator[List[str]]:
+        """Pass rows through unchanged while profiling them"""
+        columns = self.columns
+        for row in rows:
+            self.rows += 1
+            for column, value in zip(columns, row):
+                column.observe(value)
+            yield row
+
+    def to_dict(self) -> Dict:
+        return {
+            "rows": self.rows,
+            "columns": {
+                name: column.to_dict() for name, column in zip(self.header, self.columns)
+            },
+        }
+
+
+def _merge_bound(a, b, pick):
+    if a is None or b is None:
+        return b if a is None else a
+    if isinstance(a, str) != isinstance(b, str):
+        a, b = str(a), str(b)
+    return pick(a, b)
+
+
+def merge_column(previous: Dict, current: Dict) -> Dict:
+    """Combine the profile of an appended batch into a table's profile"""
+    sketch = HyperLogLog.loads(previous["hll"])
+    sketch.merge(HyperLogLog.loads(current["hll"]))
+    count = previous["count"] + current["count"]
+    nulls = previous["nulls"] + current["nulls"]
+    merged = dict(previous)
+    merged.update(
+        {
+            "count": count,
+            "nulls": nulls,
+            "null_fraction": nulls / count if count else 0.0,
+            "min": _merge_bound(previous["min"], current["min"], min),
+            "max": _merge_bound(previous["max"], current["max"], max),
+            "numeric": previous["numeric"] and current["numeric"],
+            "integral": previous.get("integral", False) and current["integral"],
+            "max_length": max(previous["max_length"], current["max_length"]),
+            "distinct": sketch.estimate(),
+            "hll": sketch.dumps(),
+        }
+    )
+    return merged
+
+
+def type_drift(data_type: Optional[str], current: Dict) -> List[str]:
+    """Reasons the current values no longer fit a stored column type.
+
+    A wider range alone is not drift (ids and dates grow every load); only
+    values the type cannot hold are, since a reused type would reject or
+    silently cut them.
+    """
+    has_values = current["count"] > current["nulls"]
+    if data_type in INTEGER_RANGES and has_values:
+        if not current["integral"]:
+            return [f"values no longer fit {data_type}"]
+        low, high = INTEGER_RANGES[data_type]
+        if current["min"] < low or current["max"] > high:
+            return [f"values {current['min']}..{current['max']} overflow {data_type}"]
+    if data_type == "date" and current["max_length"] > DATE_MAX_LENGTH:
+        return [f"values up to {current['max_length']} characters, a time part?"]
+    return []
+
+
+def column_drift(previous: Dict, current: Dict) -> List[str]:
+    """Reasons a column's data no longer looks like the previous load"""
+    reasons = type_drift(previous.get("type"), current)
+    if abs(current["null_fraction"] - previous["null_fraction"]) > DRIFT_NULL_FRACTION:
+        reasons.append(
+            f"null fraction {previous['null_fraction']:.2f} -> {current['null_fraction']:.2f}"
+        )
+    if previous["numeric"] and not current["numeric"] and current["count"] > current["nulls"]:
+        reasons.append("non-numeric values appeared")
+    low, high = sorted((previous["distinct"], current["distinct"]))
+    if high >= DRIFT_MIN_DISTINCT and high > low * DRIFT_DISTINCT_RATIO:
+        reasons.append(f"distinct {previous['distinct']} -> {current['distinct']}")
+    return reasons
+
+
+class ProfileStore:
+    """Latest column profiles per table, persisted across runs"""
+
+    def __init__(self, path: str = PROFILE_FILE):
+        self.path = path
+        self.previous: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.previous = json.load(f)
+        self.current: Dict[str, TableProfile] = {}
+        self.types: Dict[str, Dict[str, str]] = {}
+
+    def profiler(self, table_name: str) -> Callable[[List[str]], TableProfile]:
+        """Factory for the table's profile, called with the CSV header"""
+
+        def start(header: List[str]) -> TableProfile:
+            profile = TableProfile(header)
+            self.current[table_name] = profile
+            return profile
+
+        return start
+
+    def drift(self, table_name: str) -> Dict[str, List[str]]:
+        """Drifted columns of the current load against the stored profile"""
+        previous = self.previous.get(table_name, {}).get("columns", {})
+        current = self.current.get(table_name)
+        if current is None or not previous:
+            return {}
+        drifted = {}
+        for name, stats in current.to_dict()["columns"].items():
+            if name not in previous:
+                drifted[name] = ["new column"]
+                continue
+            reasons = column_drift(previous[name], stats)
+            if reasons:
+                drifted[name] = reasons
+        for name in previous:
+            if name not in current.header:
+                drifted[name] = ["column dropped"]
+        return drifted
+
+    def report_drift(self, table_names: List[str]) -> Dict[str, Dict[str, List[str]]]:
+        """Log drifted columns per table"""
+        report = {}
+        for table_name in table_names:
+            drifted = self.drift(table_name)
+            for column, reasons in drifted.items():
+                line = f"Drift in {table_name}.{column}: {'; '.join(reasons)}"
+                print(line)
+                logging.warning(line)
+            if drifted:
+                report[table_name] = drifted
+        return report
+
+    def known_types(self, table_name: str) -> Dict[str, str]:
+        """Stored types for columns profiled in this load that did not drift"""
+        current = self.current.get(table_name)
+        if current is None:
+            return {}
+        previous = self.previous.get(table_name, {}).get("columns", {})
+        drifted = self.drift(table_name)
+        return {
+            name: previous[name]["type"]
+            for name in current.header
+            if name in previous and previous[name].get("type") and name not in drifted
+        }
+
+    def record_types(self, table_name: str, column_types: Dict[str, str]):
+        self.types.setdefault(table_name, {}).update(column_types)
+
+    def cardinalities(self, table_names: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+        """Distinct counts per column, from this run or the stored profiles"""
+        result = {}
+        for table_name in table_names or list(self.previous):
+            current = self.current.get(table_name)
+            if current is not None:
+                columns = current.to_dict()["columns"]
+            else:
+                columns = self.previous.get(table_name, {}).get("columns", {})
+            if columns:
+                result[table_name] = {
+                    name: stats["distinct"] for name, stats in columns.items()
+                }
+        return result
+
+    def save(self, table_names: List[str], appended: Optional[List[str]] = None):
+        """Store the profiles of loaded tables; appended ones merge into the stored profile"""
+        appended = appended or []
+        loaded = datetime.datetime.now().isoformat(timespec="seconds")
+        for table_name in table_names:
+            current = self.current.get(table_name)
+            if current is None:
+                continue
+            drifted = self.drift(table_name)
+            profile = current.to_dict()
+            previous = self.previous.get(table_name)
+            # Types stay valid while the data does not drift, including when
+            # this run set none (vertica_upload.py does no type inference)
+            previous_columns = previous["columns"] if previous else {}
+            for name, stats in profile["columns"].items():
+                stored_type = previous_columns.get(name, {}).get("type")
+                if stored_type and name not in drifted:
+                    stats["type"] = stored_type
+            if table_name in appended and previous:
+                columns = previous["columns"]
+                for name, stats in profile["columns"].items():
+                    if name in columns:
+                        columns[name] = merge_column(columns[name], stats)
+                    else:
+                        columns[name] = stats
+                    if name in drifted:
+                        columns[name].pop("type", None)
+                profile = {"rows": previous["rows"] + profile["rows"], "columns": columns}
+            for name, data_type in self.types.get(table_name, {}).items():
+                if name in profile["columns"]:
+                    profile["columns"][name]["type"] = data_type
+            profile["loaded"] = loaded
+            self.previous[table_name] = profile
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.previous, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,226 @@
+"""
+Opt-in run profiler for --profile
+
+A sampling thread records the Python stack of every busy thread every
+SAMPLE_INTERVAL seconds, prefixed with the pipeline phase running at the
+time, and SQL statements are timed as they execute. At the end of the run
+profiles/<pipeline>_<timestamp>/ holds:
+
+* stacks.folded: collapsed stacks ("phase;frame;frame count"), the input
+  format of flamegraph.pl, speedscope and inferno
+* queries.tsv: every timed statement (phase, seconds, statement)
+* slow_queries.txt: the TOP_QUERIES statements with the most total time
+
+Sampling keeps the overhead flat however hot the loop being measured is.
+"""
+
+import collections
+import concurrent.futures.thread
+import datetime
+import os
+import re
+import selectors
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, List, Optional, Set, Tuple
+
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL = 0.005
+TOP_QUERIES = 20
+STATEMENT_CHARS = 300
+
+# Code objects a parked thread sits in: a pool worker waiting for work
+# (blocked in the C-level queue get directly under _worker), a thread waiting
+# on a lock, event or future, and an idle event loop
+IDLE_CODES = {
+    concurrent.futures.thread._worker.__code__,
+    threading.Condition.wait.__code__,
+    selectors.DefaultSelector.select.__code__,
+}
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _normalize(statement: str) -> str:
+    return re.sub(r"\s+", " ", str(statement)).strip()[:STATEMENT_CHARS]
+
+
+class RunProfiler:
+    """Stack sampler and SQL timer for one pipeline run"""
+
+    def __init__(
+        self,
+        pipeline: str,
+        output_dir: str = PROFILE_DIR,
+        interval: float = SAMPLE_INTERVAL,
+        top_n: int = TOP_QUERIES,
+    ):
+        self.pipeline = pipeline
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top_n = top_n
+        self.current_phase = "main"
+        self.stacks: collections.Counter = collections.Counter()
+        self.queries: List[Tuple[str, float, str]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ignored: Set[int] = set()
+
+    def ignore_thread(self, thread: Optional[threading.Thread]):
+        """Leave a helper thread (e.g. the logging listener) out of the samples"""
+        if thread is not None and thread.ident is not None:
+            self._ignored.add(thread.ident)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._sample, name="profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _sample(self):
+        self._ignored.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            phase = self.current_phase
+            for ident, frame in sys._current_frames().items():
+                if ident in self._ignored or frame.f_code in IDLE_CODES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(phase)
+                self.stacks[";".join(reversed(stack))] += 1
+
+    @contextmanager
+    def phase(self, name: str):
+        previous, self.current_phase = self.current_phase, name
+        try:
+            yield
+        finally:
+            self.current_phase = previous
+
+    def record_sql(self, statement: str, seconds: float):
+        self.queries.append((self.current_phase, seconds, _normalize(statement)))
+
+    def timed(self, func: Callable, label: Callable = lambda *a, **k: a[0]) -> Callable:
+        """Wrap func so each call is recorded under label(*args) with its latency"""
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record_sql(label(*args, **kwargs), time.time() - start)
+
+        return wrapper
+
+    def instrument(self, etl):
+        """Time the SQL a DatabaseETL instance runs"""
+        # Looked up by name: the pipeline module may be running as __main__
+        base = next(c for c in type(etl).__mro__ if c.__name__ == "DatabaseETL")
+        etl.execute_query = self.timed(etl.execute_query)
+        etl.fetch_results = self.timed(etl.fetch_results)
+        etl.copy_stream = self.timed(
+            etl.copy_stream, lambda table_name, *a, **k: f"COPY {table_name} FROM STDIN"
+        )
+        # The base implementations go through execute_query/fetch_results
+        # already; overrides run statements on their own connections
+        if type(etl).execute_parallel is not base.execute_parallel:
+            execute_parallel = etl.execute_parallel
+
+            @wraps(execute_parallel)
+            def timed_parallel(queries, *args, **kwargs):
+                timings = execute_parallel(queries, *args, **kwargs)
+                for query, seconds, _ in timings:
+                    self.record_sql(query, seconds)
+                return timings
+
+            etl.execute_parallel = timed_parallel
+        if type(etl).fetch_many is not base.fetch_many:
+            etl.fetch_many = self.timed(
+                etl.fetch_many,
+                lambda queries, *a, **k: f"[{len(queries)} concurrent] "
+                + (queries[0] if queries else ""),
+            )
+
+    def cursor(self, cursor) -> "TimedCursor":
+        return TimedCursor(cursor, self)
+
+    def instrument_loader(self, loader):
+        """Time the COPY statements of the vertica_loader module"""
+        loader.copy_stream = self.timed(
+            loader.copy_stream,
+            lambda conn, full_table, *a, **k: f"COPY {full_table} FROM STDIN",
+        )
+
+    def slow_queries(self) -> List[Tuple[str, int, float, float]]:
+        """(statement, calls, total seconds, max seconds), most total time first"""
+        totals = collections.defaultdict(lambda: [0, 0.0, 0.0])
+        for _, seconds, statement in self.queries:
+            entry = totals[statement]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            (statement, calls, total, longest)
+            for statement, (calls, total, longest) in ranked[: self.top_n]
+        ]
+
+    def write(self) -> str:
+        """Write the profile files, print the slow query list, return the directory"""
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.output_dir, f"{self.pipeline}_{stamp}")
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, "stacks.folded"), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(path, "queries.tsv"), "w") as f:
+            f.write("phase\tseconds\tstatement\n")
+            for phase, seconds, statement in self.queries:
+                f.write(f"{phase}\t{seconds:.6f}\t{statement}\n")
+
+        lines = [f"{'calls':>6} {'total s':>10} {'max s':>9}  statement"]
+        for statement, calls, total, longest in self.slow_queries():
+            lines.append(f"{calls:>6} {total:>10.3f} {longest:>9.3f}  {statement}")
+        with open(os.path.join(path, "slow_queries.txt"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        print(f"Top {self.top_n} statements by total time:")
+        for line in lines:
+            print(line)
+        print(f"Profile written to {path} (flame graph: flamegraph.pl {path}/stacks.folded)")
+        return path
+
+
+class TimedCursor:
+    """DBAPI cursor proxy recording execute() latencies"""
+
+    def __init__(self, cursor, profiler: RunProfiler):
+        self._cursor = cursor
+        self._profiler = profiler
+
+    def execute(self, operation, *args, **kwargs):
+        start = time.time()
+        try:
+            return self._cursor.execute(operation, *args, **kwargs)
+        finally:
+            self._profiler.record_sql(operation, time.time() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
@@ -0,0 +1,77 @@
+import pytest
+
+from embedded_etl import SQLiteETL
+
+SCHEMA = "s"
+
+
+@pytest.fixture
+def etl(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    etl = SQLiteETL(str(tmp_path / "config.json"))
+    etl.get_db_connection()
+    etl.prepare_schema(SCHEMA)
+    yield etl
+    etl.connection.close()
+
+
+def create(etl, table, rows):
+    etl.execute_query(f"CREATE TABLE {SCHEMA}.{table} (a text, b text);")
+    for row in rows:
+        etl.execute_query(f"INSERT INTO {SCHEMA}.{table} VALUES (?, ?);", row)
+
+
+def test_within_thresholds_switches(etl):
+    create(etl, "t", [(str(i), "x") for i in range(10)])
+    create(etl, "t_build", [(str(i), "x") for i in range(11)])
+    etl.load_counts = {"t": 11}
+    thresholds = {"t": {"max_row_change": 0.2, "max_null_change": 0.1}}
+    assert etl.diff_tables(["t.csv"], SCHEMA, thresholds) == []
+
+
+def test_row_and_null_changes_are_refused(etl):
+    create(etl, "t", [(str(i), "x") for i in range(10)])
+    create(etl, "t_build", [(str(i), None) for i in range(5)])
+    etl.load_counts = {"t": 5}
+    assert etl.diff_tables(["t.csv"], SCHEMA, {"t": {"max_row_change": 0.2}}) == [
+        "t.csv"
+    ]
+    assert etl.diff_tables(["t.csv"], SCHEMA, {"t": {"max_null_change": 0.5}}) == [
+        "t.csv"
+    ]
+    assert etl.diff_tables(["t.csv"], SCHEMA, {}) == []
+
+
+def test_accepted_table_switches(etl):
+    create(etl, "t", [("1", "x")])
+    create(etl, "t_build", [("1", "x"), ("2", "x"), ("3", "x")])
+    etl.load_counts = {"t": 3}
+    thresholds = {"t": {"max_row_change": 0.1}}
+    assert etl.diff_tables(["t.csv"], SCHEMA, thresholds, accepted=["t"]) == []
+
+
+def test_empty_production_table_is_no_baseline(etl):
+    create(etl, "t", [])
+    create(etl, "t_build", [("1", None), ("2", "x")])
+    etl.load_counts = {"t": 2}
+    thresholds = {"t": {"max_row_change": 0.1, "max_null_change": 0.1}}
+    assert etl.diff_tables(["t.csv"], SCHEMA, thresholds) == []
+
+
+def test_new_table_is_not_diffed(etl):
+    create(etl, "t_build", [("1", "x")])
+    etl.load_counts = {"t": 1}
+    assert etl.diff_tables(["t.csv"], SCHEMA, {"t": {"max_row_change": 0.0}}) == []
+
+
+def test_failed_load_and_failed_diff_are_refused(etl, monkeypatch):
+    create(etl, "t", [("1", "x")])
+    create(etl, "t_build", [("1", "x")])
+    etl.load_counts = {}
+    assert etl.diff_tables(["t.csv"], SCHEMA, {}, accepted=["t"]) == ["t.csv"]
+
+    etl.load_counts = {"t": 1}
+    monkeypatch.setattr(etl, "fetch_results", lambda query: [])
+    monkeypatch.setattr(etl, "is_table_exist", lambda table, schema: True)
+    monkeypatch.setattr(etl, "get_return_list", lambda query: ["a", "b"])
+    assert etl.diff_tables(["t.csv"], SCHEMA, {}) == ["t.csv"]
@@ -0,0 +1,36 @@
+from load_tables_daily import count_source_rows, parse_copy_output
+
+
+def test_count_source_rows_plain(tmp_path):
+    path = tmp_path / "plain.csv"
+    path.write_text("a,b\n1,2\n3,4")
+    assert count_source_rows(str(path)) == 2
+
+
+def test_count_source_rows_quoted_newlines(tmp_path):
+    path = tmp_path / "quoted.csv"
+    path.write_text('a,b\n1,"two\nlines"\n3,4\n')
+    assert count_source_rows(str(path)) == 2
+
+
+def test_count_source_rows_header_only(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("a,b\n")
+    assert count_source_rows(str(path)) == 0
+
+
+def test_parse_copy_output_psql_and_vsql():
+    output = "\n".join(
+        [
+            "LOAD first",
+            "COPY 12",
+            "LOAD second",
+            " Rows Loaded ",
+            "-------------",
+            "          7",
+            "(1 row)",
+            "LOAD failed",
+            "ERROR:  relation does not exist",
+        ]
+    )
+    assert parse_copy_output(output) == {"first": 12, "second": 7}
@@ -0,0 +1,35 @@
+import pytest
+
+from manifest import Manifest
+
+
+def test_schedule_by_priority_then_size(tmp_path):
+    for name, size in (("small.csv", 10), ("big.csv", 1000), ("urgent.csv", 1)):
+        (tmp_path / name).write_text("x" * size)
+    manifest = Manifest(
+        {"tables": [{"file": "urgent.csv", "priority": 5}, {"file": "big.csv"}]}
+    )
+    files = ["small.csv", "big.csv", "urgent.csv", "missing.csv"]
+    assert manifest.schedule(files, str(tmp_path)) == [
+        "urgent.csv",
+        "big.csv",
+        "small.csv",
+        "missing.csv",
+    ]
+
+
+def test_defaults_and_shard_sizes():
+    manifest = Manifest(
+        {
+            "defaults": {"parallelism": 2},
+            "tables": [{"file": "A.csv", "shard_size": 500}, {"file": "b.csv"}],
+        }
+    )
+    assert manifest.parallelism() == {"a": 2, "b": 2}
+    assert manifest.shard_sizes() == {"a": 500}
+    assert manifest.table("other.csv")["load"] == "full"
+
+
+def test_unknown_load_strategy():
+    with pytest.raises(ValueError):
+        Manifest({"tables": [{"file": "a.csv", "load": "merge"}]})
@@ -0,0 +1,76 @@
+from profiles import HyperLogLog, TableProfile, column_drift, merge_column
+
+
+def profile(values, data_type=None):
+    table = TableProfile(["c"])
+    for _ in table.observe([value] for value in values):
+        pass
+    column = table.to_dict()["columns"]["c"]
+    if data_type:
+        column["type"] = data_type
+    return column
+
+
+def test_hyperloglog_estimate_within_a_few_percent():
+    sketch = HyperLogLog()
+    for i in range(50000):
+        sketch.add(str(i))
+    assert abs(sketch.estimate() - 50000) / 50000 < 0.1
+
+
+def test_hyperloglog_small_counts_and_round_trip():
+    sketch = HyperLogLog()
+    for value in ("a", "b", "c", "a"):
+        sketch.add(value)
+    assert sketch.estimate() == 3
+    assert HyperLogLog.loads(sketch.dumps()).registers == sketch.registers
+
+
+def test_hyperloglog_merge_counts_the_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    for i in range(10000):
+        left.add(str(i))
+        right.add(str(i + 5000))
+    left.merge(right)
+    assert abs(left.estimate() - 15000) / 15000 < 0.1
+
+
+def test_merge_column_combines_counts_and_bounds():
+    merged = merge_column(profile(["1", "5", ""]), profile(["3", "9"]))
+    assert merged["count"] == 5
+    assert merged["nulls"] == 1
+    assert merged["null_fraction"] == 0.2
+    assert (merged["min"], merged["max"]) == (1.0, 9.0)
+    assert merged["integral"]
+    assert merged["distinct"] == 4
+
+
+def test_merge_column_keeps_the_stored_type():
+    merged = merge_column(profile(["1"], "integer"), profile(["2.5"]))
+    assert merged["type"] == "integer"
+    assert not merged["integral"]
+
+
+def test_growing_range_is_not_drift():
+    previous = profile([str(i) for i in range(1000)], "integer")
+    current = profile([str(i) for i in range(1000, 2000)])
+    assert column_drift(previous, current) == []
+
+
+def test_timestamp_in_date_column_is_drift():
+    previous = profile(["2024-01-01", "2024-01-02"], "date")
+    current = profile(["2024-01-03", "2024-01-03 12:00:00"])
+    assert column_drift(previous, current)
+
+
+def test_integer_overflow_and_fractions_are_drift():
+    previous = profile(["1", "2"], "smallint")
+    assert column_drift(previous, profile(["1", "40000"]))
+    assert column_drift(previous, profile(["1", "2.5"]))
+
+
+def test_null_fraction_and_non_numeric_drift():
+    previous = profile(["1", "2", "3", "4"])
+    reasons = column_drift(previous, profile(["1", "", "", "x"]))
+    assert any("null fraction" in reason for reason in reasons)
+    assert "non-numeric values appeared" in reasons
@@ -0,0 +1,35 @@
+import csv
+import io
+
+from transforms import POSTGRESQL_FORMAT, VERTICA_FORMAT, CsvStream
+
+
+def test_vertica_format_escapes_delimiters_and_newlines():
+    rows = [["a,b", "c\\d", "line\nbreak", 'say "hi"']]
+    data = CsvStream(rows, **VERTICA_FORMAT).read()
+    assert data == b'a\\,b,c\\\\d,line\\\nbreak,say \\"hi\\"\n'
+
+
+def test_lone_empty_field_is_a_blank_line():
+    for fmtparams in (VERTICA_FORMAT, POSTGRESQL_FORMAT):
+        assert CsvStream([["x"], [""], ["y"]], **fmtparams).read() == b"x\n\ny\n"
+
+
+def test_postgresql_format_round_trips():
+    rows = [["a,b", 'q"uote', "multi\nline", ""]]
+    data = CsvStream(rows, **POSTGRESQL_FORMAT).read().decode("utf-8")
+    assert list(csv.reader(io.StringIO(data))) == rows
+
+
+def test_small_reads_and_rows_per_write():
+    rows = [[str(i), "v"] for i in range(25)]
+    stream = CsvStream(rows, rows_per_write=3)
+    chunks = []
+    while True:
+        chunk = stream.read(7)
+        if not chunk:
+            break
+        assert len(chunk) <= 7
+        chunks.append(chunk)
+    expected = "".join(f"{i},v\n" for i in range(25)).encode("utf-8")
+    assert b"".join(chunks) == expected
@@ -0,0 +1,252 @@
+"""
+Streaming per-column transforms applied between the CSV reader and COPY
+
+Transforms are declared per table in the manifest:
+
+    "transforms": {"*": ["trim"], "is_active": ["bool"], "service_date": ["date"]}
+
+"*" applies to every column, before the column's own transforms. Rows
+flow through a generator pipeline into CsvStream, a file-like object that
+COPY FROM STDIN reads in buffer-sized pieces, so no cleaned copy of the
+file is ever written and memory stays bounded.
+
+csv.reader does not tell a quoted empty field ("") from a missing one, so
+both are written unquoted and COPY loads them as NULL. A raw file load
+would keep "" as an empty string; tables that need that distinction must
+not be streamed (no transforms and no profile store).
+"""
+
+import csv
+import datetime
+import io
+from functools import lru_cache
+from itertools import islice
+from typing import IO, TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional
+
+from lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    from etl_logging import ProgressReporter
+    from profiles import ProfileStore, TableProfile
+
+dateParser = lazy_import("dateutil.parser")
+
+TRUE_VALUES = ("t", "true", "y", "yes", "1")
+FALSE_VALUES = ("f", "false", "n", "no", "0")
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y%m%d", "%d-%b-%Y", "%m/%d/%y")
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%m/%d/%Y %H:%M:%S")
+
+# csv.writer options matching each database's COPY parser
+POSTGRESQL_FORMAT: Dict = {}
+VERTICA_FORMAT = {"quoting": csv.QUOTE_NONE, "escapechar": "\\"}
+
+ROWS_PER_WRITE = 1000
+
+
+def trim(value: str) -> str:
+    return value.strip()
+
+
+def null_empty(value: str) -> str:
+    """Whitespace-only values become empty, which COPY loads as NULL"""
+    return value if value.strip() else ""
+
+
+def normalize_bool(value: str) -> str:
+    lowered = value.strip().lower()
+    if lowered in TRUE_VALUES:
+        return "true"
+    if lowered in FALSE_VALUES:
+        return "false"
+    return value
+
+
+def _parse_datetime(value: str, formats) -> datetime.datetime:
+    for fmt in formats:
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return dateParser.parse(value)
+
+
+@lru_cache(maxsize=65536)
+def iso_date(value: str) -> str:
+    """Standardize a date to YYYY-MM-DD, leaving unparseable values as they are"""
+    if not value.strip():
+        return value
+    try:
+        return _parse_datetime(value.strip(), DATE_FORMATS).strftime("%Y-%m-%d")
+    except (ValueError, OverflowError):
+        return value
+
+
+@lru_cache(maxsize=65536)
+def iso_timestamp(value: str) -> str:
+    """Standardize a timestamp to YYYY-MM-DD HH:MM:SS"""
+    if not value.strip():
+        return value
+    try:
+        parsed = _parse_datetime(value.strip(), TIMESTAMP_FORMATS + DATE_FORMATS)
+        return parsed.strftime("%Y-%m-%d %H:%M:%S")
+    except (ValueError, OverflowError):
+        return value
+
+
+TRANSFORMS: Dict[str, Callable[[str], str]] = {
+    "trim": trim,
+    "null_empty": null_empty,
+    "bool": normalize_bool,
+    "date": iso_date,
+    "timestamp": iso_timestamp,
+    "upper": str.upper,
+    "lower": str.lower,
+}
+
+
+def _chain(functions: List[Callable[[str], str]]) -> Callable[[str], str]:
+    if len(functions) == 1:
+        return functions[0]
+
+    def apply(value: str) -> str:
+        for function in functions:
+            value = function(value)
+        return value
+
+    return apply
+
+
+def build_row_transform(
+    header: List[str], spec: Dict[str, List[str]]
+) -> Callable[[List[str]], List[str]]:
+    """Compile a per-table transform spec into a function over CSV rows"""
+    unknown = {name for names in spec.values() for name in names} - set(TRANSFORMS)
+    if unknown:
+        raise ValueError(f"Unknown transforms: {', '.join(sorted(unknown))}")
+
+    common = [TRANSFORMS[name] for name in spec.get("*", [])]
+    plan = []
+    for index, column in enumerate(header):
+        functions = common + [TRANSFORMS[name] for name in spec.get(column, [])]
+        if functions:
+            plan.append((index, _chain(functions)))
+
+    def transform(row: List[str]) -> List[str]:
+        for index, function in plan:
+            if index < len(row):
+                row[index] = function(row[index])
+        return row
+
+    return transform
+
+
+def transform_rows(
+    rows: Iterable[List[str]], transform: Callable[[List[str]], List[str]]
+) -> Iterator[List[str]]:
+    for row in rows:
+        yield transform(row)
+
+
+class CsvStream(io.RawIOBase):
+    """Read-only file object that renders an iterator of rows as CSV bytes"""
+
+    def __init__(
+        self,
+        rows: Iterable[List[str]],
+        rows_per_write: int = ROWS_PER_WRITE,
+        **fmtparams,
+    ):
+        self._rows = iter(rows)
+        self._rows_per_write = rows_per_write
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text, lineterminator="\n", **fmtparams)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self, size: int):
+        while size < 0 or len(self._pending) < size:
+            batch = list(islice(self._rows, self._rows_per_write))
+            if not batch:
+                return
+            # A lone empty field must be quoted under QUOTE_NONE, and would
+            # load as "" rather than NULL under QUOTE_MINIMAL: write a blank line
+            self._writer.writerows([] if row == [""] else row for row in batch)
+            self._pending += self._text.getvalue().encode("utf-8")
+            self._text.seek(0)
+            self._text.truncate()
+
+    def close(self):
+        close_rows = getattr(self._rows, "close", None)
+        if close_rows is not None:
+            close_rows()
+        super().close()
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None:
+            size = -1
+        self._fill(size)
+        if size < 0:
+            data, self._pending = self._pending, b""
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+def open_transformed(
+    file_path: str,
+    spec: Dict[str, List[str]],
+    fmtparams: Dict,
+    profiler: Optional[Callable[[List[str]], "TableProfile"]] = None,
+    progress: Optional["ProgressReporter"] = None,
+    rows_per_write: Optional[int] = None,
+) -> CsvStream:
+    """Stream a CSV file (header included) through the table's transforms.
+
+    profiler(header) returns a profiles.TableProfile that observes the
+    transformed rows on their way to COPY; progress counts them.
+    rows_per_write is the table's manifest shard_size.
+    """
+    csvfile = open(file_path, encoding="utf-8", newline="")
+    reader = csv.reader(csvfile, delimiter=",")
+    header = next(reader, [])
+    transform = build_row_transform(header, spec)
+
+    def rows():
+        try:
+            yield header
+            data = transform_rows(reader, transform)
+            if profiler is not None:
+                data = profiler(header).observe(data)
+            if progress is not None:
+                data = progress.track(data)
+            yield from data
+        finally:
+            csvfile.close()
+
+    return CsvStream(rows(), rows_per_write or ROWS_PER_WRITE, **fmtparams)
+
+
+def stream_opener(
+    specs: Dict[str, Dict[str, List[str]]],
+    fmtparams: Dict,
+    profile_store: Optional["ProfileStore"] = None,
+    shard_sizes: Optional[Dict[str, int]] = None,
+) -> Callable[[str, str], IO]:
+    """open_stream hook for vertica_loader: transform tables that have a spec,
+    profile every table when a profile store is given"""
+    shard_sizes = shard_sizes or {}
+
+    def open_stream(table_name: str, file_path: str) -> IO:
+        if profile_store is not None or table_name in specs:
+            return open_transformed(
+                file_path,
+                specs.get(table_name, {}),
+                fmtparams,
+                profile_store.profiler(table_name) if profile_store else None,
+                rows_per_write=shard_sizes.get(table_name),
+            )
+        return open(file_path, "rb")
+
+    return open_stream
@@ -0,0 +1,140 @@
+"""
+Column type guessing, usable from worker processes
+
+guess_type is a pure function of a value and the backend's default type,
+so sampled columns can be classified in a process pool. Samples cross the
+process boundary as one NUL-joined string of distinct values per column:
+a single object pickles far cheaper than a list of rows, and the type set
+of a column only depends on its distinct values.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import FrozenSet, Iterable, List, Optional
+
+from lazy_import import lazy_import
+
+dateParser = lazy_import("dateutil.parser")
+
+SEPARATOR = "\0"
+
+
+def is_bool(string: str) -> bool:
+    return string.lower() in ("true", "false", "t", "f")
+
+
+def is_integer(string: str) -> bool:
+    try:
+        a = float(string)
+        n = int(a)
+        return a == n
+    except Exception:
+        return False
+
+
+def is_numeric(string: str) -> bool:
+    try:
+        float(string)
+        return True
+    except Exception:
+        return False
+
+
+def is_date(string: str) -> bool:
+    try:
+        dt = dateParser.parse(string)
+        return (dt.hour, dt.minute, dt.second) == (0, 0, 0)
+    except ImportError:
+        raise
+    except Exception:
+        return False
+
+
+def is_timestamp(string: str) -> bool:
+    try:
+        dateParser.parse(string)
+        return True
+    except ImportError:
+        raise
+    except Exception:
+        return False
+
+
+def guess_type(s: str, default_type: str) -> str:
+    if not s:
+        return default_type
+
+    if is_numeric(s):
+        try:
+            if float(s) == int(float(s)):
+                if s in ("0", "1"):
+                    return "smallint"
+
+                if s[0] == "0":
+                    return default_type
+
+                if -32768 <= int(float(s)) <= 32767:
+                    return "smallint"
+
+                if -2147483648 <= int(float(s)) <= 2147483647:
+                    return "integer"
+                else:
+                    return "bigint"
+            else:
+                return "numeric"
+        except Exception:
+            return "numeric"
+    else:
+        if is_bool(s):
+            return "boolean"
+
+        if is_timestamp(s):
+            if is_date(s):
+                return "date"
+            else:
+                return "timestamp"
+
+    return default_type
+
+
+def pack_values(values: Iterable[str]) -> Optional[str]:
+    """Compact form of a column sample: its distinct values, NUL-joined.
+
+    None stands for an empty sample; "" is a sample whose only value is "".
+    """
+    distinct = set(values)
+    if not distinct:
+        return None
+    return SEPARATOR.join(distinct)
+
+
+def guess_type_set(packed: Optional[str], default_type: str) -> FrozenSet[str]:
+    """Types guessed for every value of a packed column sample"""
+    if packed is None:
+        return frozenset()
+    return frozenset(guess_type(value, default_type) for value in packed.split(SEPARATOR))
+
+
+def create_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn: the parent may be running event-loop and COPY threads
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def guess_type_sets(
+    packed_samples: List[Optional[str]],
+    default_type: str,
+    pool: ProcessPoolExecutor,
+    workers: int,
+) -> List[FrozenSet[str]]:
+    """Classify many packed column samples in a process pool, in order"""
+    chunksize = max(1, len(packed_samples) // (workers * 4))
+    return list(
+        pool.map(
+            guess_type_set,
+            packed_samples,
+            [default_type] * len(packed_samples),
+            chunksize=chunksize,
+        )
+    )
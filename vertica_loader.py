@@ -0,0 +1,162 @@
+"""
+In-process Vertica bulk loader using COPY FROM STDIN
+
+Streams each CSV file through cursor.copy() in fixed-size buffers, so
+memory stays bounded regardless of file size. Tables load concurrently,
+one pooled session per table. Per table it reports accepted and rejected
+row counts, the rejected data table, and throughput.
+
+A transform stage (transforms.py) can be put in front of COPY through the
+open_stream hook. Rejected rows go to REJECTED DATA AS TABLE
+<table>_rejected, next to the loaded table, with the reason of each
+rejection; a file path would be resolved on the initiator node, not here.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+COPY_BUFFER_SIZE = 1 << 20
+
+
+def rejects_table(full_table: str) -> str:
+    return f"{full_table}_rejected"
+
+
+def copy_sql(full_table: str) -> str:
+    return (
+        f"COPY {full_table} FROM STDIN DELIMITER ',' SKIP 1 "
+        f"REJECTED DATA AS TABLE {rejects_table(full_table)};"
+    )
+
+
+def copy_stream(
+    conn,
+    full_table: str,
+    stream,
+    buffer_size: int = COPY_BUFFER_SIZE,
+) -> Tuple[int, int]:
+    """COPY a file-like object into a table, return (accepted, rejected)"""
+    cursor = conn.cursor()
+    # Rejects of an earlier run would otherwise be mixed with this one's
+    cursor.execute(f"DROP TABLE IF EXISTS {rejects_table(full_table)};")
+    cursor.copy(copy_sql(full_table), stream, buffer_size=buffer_size)
+    cursor.execute("SELECT GET_NUM_ACCEPTED_ROWS(), GET_NUM_REJECTED_ROWS();")
+    accepted, rejected = cursor.fetchone()
+    conn.commit()
+    return accepted, rejected
+
+
+def open_raw(table_name: str, file_path: str) -> IO:
+    return open(file_path, "rb")
+
+
+def load_file(
+    connection: Callable,
+    full_table: str,
+    table_name: str,
+    file_path: str,
+    buffer_size: int = COPY_BUFFER_SIZE,
+    open_stream: Callable[[str, str], IO] = open_raw,
+) -> Dict:
+    """Load one CSV file, returning its load report"""
+    report = {
+        "table": table_name,
+        "full_table": full_table,
+        "bytes": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
+        "accepted": 0,
+        "rejected": 0,
+        "rejected_table": rejects_table(full_table),
+        "seconds": 0.0,
+        "error": None,
+    }
+    start = time.time()
+    try:
+        with connection() as conn, open_stream(table_name, file_path) as stream:
+            report["accepted"], report["rejected"] = copy_stream(
+                conn, full_table, stream, buffer_size
+            )
+    except Exception as ex:
+        report["error"] = str(ex)
+    report["seconds"] = time.time() - start
+    return report
+
+
+def load_files(
+    jobs: List[Tuple[str, str, str]],
+    connection: Callable,
+    workers: int = 4,
+    buffer_size: int = COPY_BUFFER_SIZE,
+    open_stream: Optional[Callable[[str, str], IO]] = None,
+) -> List[Dict]:
+    """Load (full_table, table_name, file_path) jobs concurrently and log a report.
+
+    open_stream(table_name, file_path) supplies the data for each COPY; by
+    default the file is streamed as-is.
+    """
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [
+            executor.submit(
+                load_file,
+                connection,
+                full_table,
+                table_name,
+                path,
+                buffer_size,
+                open_stream or open_raw,
+            )
+            for full_table, table_name, path in jobs
+        ]
+        reports = [future.result() for future in futures]
+    elapsed = time.time() - start
+
+    for r in reports:
+        seconds = max(r["seconds"], 1e-6)
+        if r["error"]:
+            line = f"COPY {r['full_table']} failed after {r['seconds']:.1f}s: {r['error']}"
+            logging.error(line)
+        else:
+            line = (
+                f"COPY {r['full_table']}: accepted={r['accepted']} "
+                f"rejected={r['rejected']} in {r['seconds']:.1f}s "
+                f"({r['bytes'] / seconds / (1 << 20):.1f} MB/s, "
+                f"{r['accepted'] / seconds:.0f} rows/s)"
+            )
+            if r["rejected"]:
+                line += f" rejected rows in {r['rejected_table']}"
+                logging.warning(line)
+            else:
+                logging.info(line)
+        print(line)
+
+    total_bytes = sum(r["bytes"] for r in reports)
+    total_rows = sum(r["accepted"] for r in reports)
+    summary = (
+        f"Loaded {total_rows} rows, {total_bytes / (1 << 20):.1f} MB in {elapsed:.1f}s "
+        f"({total_bytes / max(elapsed, 1e-6) / (1 << 20):.1f} MB/s)"
+    )
+    print(summary)
+    logging.info(summary)
+    return reports
+
+
+@contextmanager
+def opened(connect: Callable):
+    """Adapt a plain connect() function to the connection context protocol"""
+    conn = connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def failed_tables(reports: List[Dict]) -> List[str]:
+    return [r["table"] for r in reports if r["error"]]
+
+
+def accepted_counts(reports: List[Dict]) -> Dict[str, int]:
+    return {r["table"]: r["accepted"] for r in reports if not r["error"]}
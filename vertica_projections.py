@@ -0,0 +1,209 @@
+"""
+Vertica projection and encoding advisor for tables loaded by vertica_upload.py
+
+Looks at row count, column types and approximate column cardinality of a
+loaded table and creates an optimized superprojection with:
+
+* sort keys: low-cardinality columns first (best RLE compression), then the
+  segmentation column
+* segmentation: HASH(empi_id) when the table has one, otherwise the column
+  with the highest cardinality
+* encodings: RLE for low-cardinality sort columns, DELTAVAL for integer,
+  date and timestamp columns, AUTO otherwise
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+SEGMENTATION_COLUMN = "empi_id"
+LOW_CARDINALITY_RATIO = 0.01
+MAX_SORT_COLUMNS = 4
+# Exact type names: a prefix match on "int" would also catch interval
+DELTA_TYPES = {
+    "int",
+    "integer",
+    "bigint",
+    "smallint",
+    "tinyint",
+    "int8",
+    "date",
+    "timestamp",
+    "timestamptz",
+}
+BENCHMARK_RUNS = 3
+
+
+def get_column_stats(
+    cursor, schema: str, table: str, cardinalities: Optional[Dict[str, int]] = None
+) -> Tuple[int, List[Tuple[str, str, int]]]:
+    """Get row count and (column, data_type, distinct_count) for a table.
+
+    Distinct counts of columns missing from cardinalities come from one
+    APPROXIMATE_COUNT_DISTINCT scan.
+    """
+    cursor.execute(
+        f"""
+        SELECT column_name, data_type FROM v_catalog.columns
+        WHERE table_schema = '{schema}' AND table_name = '{table}'
+        ORDER BY ordinal_position;
+        """
+    )
+    columns = [(row[0], row[1].lower()) for row in cursor.fetchall()]
+    if not columns:
+        return 0, []
+
+    cardinalities = cardinalities or {}
+    missing = [name for name, _ in columns if name not in cardinalities]
+    selects = "".join(f", APPROXIMATE_COUNT_DISTINCT({name})" for name in missing)
+    cursor.execute(f"SELECT COUNT(*){selects} FROM {schema}.{table};")
+    row = cursor.fetchone()
+    row_count = row[0]
+    estimated = dict(zip(missing, row[1:]))
+    distinct = [cardinalities.get(name, estimated.get(name)) for name, _ in columns]
+
+    return row_count, [
+        (name, data_type, count) for (name, data_type), count in zip(columns, distinct)
+    ]
+
+
+def advise_projection(row_count: int, column_stats: List[Tuple[str, str, int]]) -> Dict:
+    """Choose sort order, segmentation and encodings for a table"""
+    names = [name for name, _, _ in column_stats]
+
+    low_cardinality = sorted(
+        (distinct, name)
+        for name, _, distinct in column_stats
+        if row_count and distinct <= max(row_count * LOW_CARDINALITY_RATIO, 1)
+    )
+    sort_columns = [name for _, name in low_cardinality][:MAX_SORT_COLUMNS]
+
+    # Catalog names keep the case of the CSV header
+    segment_matches = [name for name in names if name.lower() == SEGMENTATION_COLUMN]
+    if segment_matches:
+        segment_column = segment_matches[0]
+    else:
+        segment_column = max(column_stats, key=lambda stat: stat[2])[0]
+    if segment_column not in sort_columns:
+        sort_columns.append(segment_column)
+
+    encodings = {}
+    for name, data_type, _ in column_stats:
+        if name in sort_columns and name != segment_column:
+            encodings[name] = "RLE"
+        elif data_type.split("(")[0].strip().lower() in DELTA_TYPES:
+            encodings[name] = "DELTAVAL"
+        else:
+            encodings[name] = "AUTO"
+
+    return {
+        "columns": names,
+        "sort_columns": sort_columns,
+        "segment_column": segment_column,
+        "encodings": encodings,
+    }
+
+
+def build_projection_sql(schema: str, table: str, advice: Dict) -> str:
+    """Build CREATE PROJECTION statement for the advised layout"""
+    column_defs = ", ".join(
+        f"{name} ENCODING {advice['encodings'][name]}" for name in advice["columns"]
+    )
+    select_list = ", ".join(advice["columns"])
+    order_by = ", ".join(advice["sort_columns"])
+    return (
+        f"CREATE PROJECTION IF NOT EXISTS {schema}.{table}_opt ({column_defs}) "
+        f"AS SELECT {select_list} FROM {schema}.{table} "
+        f"ORDER BY {order_by} "
+        f"SEGMENTED BY HASH({advice['segment_column']}) ALL NODES KSAFE;"
+    )
+
+
+def benchmark_queries(schema: str, table: str, advice: Dict) -> List[str]:
+    """Representative analytics queries for the before/after benchmark"""
+    full_table = f"{schema}.{table}"
+    lead = advice["sort_columns"][0]
+    segment = advice["segment_column"]
+    return [
+        f"SELECT {lead}, COUNT(*) FROM {full_table} GROUP BY {lead};",
+        f"SELECT COUNT(DISTINCT {segment}) FROM {full_table};",
+    ]
+
+
+def run_benchmark(cursor, queries: List[str]) -> float:
+    """Best-of-N total wall time in seconds for the given queries"""
+    best = None
+    for _ in range(BENCHMARK_RUNS):
+        start = time.time()
+        for query in queries:
+            cursor.execute(query)
+            cursor.fetchall()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best or 0.0
+
+
+def optimize_table(
+    conn,
+    schema: str,
+    table: str,
+    benchmark: bool = False,
+    cardinalities: Optional[Dict[str, int]] = None,
+) -> Optional[Dict]:
+    """Create and refresh an optimized projection for one table"""
+    cursor = conn.cursor()
+    row_count, column_stats = get_column_stats(cursor, schema, table, cardinalities)
+    if not column_stats:
+        logging.warning("No columns found for %s.%s", schema, table)
+        return None
+
+    advice = advise_projection(row_count, column_stats)
+    queries = benchmark_queries(schema, table, advice)
+    before = run_benchmark(cursor, queries) if benchmark else None
+
+    create_sql = build_projection_sql(schema, table, advice)
+    logging.info(create_sql)
+    cursor.execute(create_sql)
+    cursor.execute(f"SELECT REFRESH('{schema}.{table}');")
+    conn.commit()
+
+    after = run_benchmark(cursor, queries) if benchmark else None
+    advice.update({"table": table, "rows": row_count, "before": before, "after": after})
+    return advice
+
+
+def optimize_tables(
+    conn,
+    schema: str,
+    tables: List[str],
+    benchmark: bool = False,
+    cardinalities: Optional[Dict[str, Dict[str, int]]] = None,
+) -> List[Dict]:
+    """Run the advisor over all tables and log a summary report"""
+    report = []
+    for table in tables:
+        try:
+            advice = optimize_table(
+                conn,
+                schema,
+                table,
+                benchmark,
+                (cardinalities or {}).get(table),
+            )
+        except Exception as ex:
+            logging.error("Projection advisor failed for %s: %s", table, ex)
+            continue
+        if advice is None:
+            continue
+
+        line = (
+            f"{schema}.{table}: rows={advice['rows']} "
+            f"order by {','.join(advice['sort_columns'])} "
+            f"segmented by {advice['segment_column']}"
+        )
+        if benchmark:
+            line += f" benchmark {advice['before']:.3f}s -> {advice['after']:.3f}s"
+        print(line)
+        logging.info(line)
+        report.append(advice)
+    return report
@@ -4,25 +4,39 @@ Unified data warehouse integration for daily and quarterly uploads
 
 import argparse
 import csv
-import json
 import logging
 import os
-import subprocess
 import time
 from datetime import datetime
-from pathlib import Path
 
-import sqlalchemy as sa
-import sqlalchemy.exc as xx
-import vertica_python
-from vertica_python.errors import ConnectionError, MissingSchema, QueryError
+import transforms
+import vertica_loader
+import vertica_projections
+from connections import ConnectionManager
+from etl_logging import setup_logging
+from lazy_import import lazy_import
+from manifest import DEFAULT_MANIFEST, load_manifest
+from planner import RunMetrics, build_plan, print_plan
+from profiles import ProfileStore
+from profiling import RunProfiler
+
+# Drivers are imported on first use so --help and --dry-run start fast
+sa = lazy_import("sqlalchemy")
+vertica_errors = lazy_import("vertica_python.errors")
+
+# Quarterly tables and their _history tables are partitioned by load quarter
+HISTORY_PARTITION_EXPR = "YEAR(load_time) * 100 + QUARTER(load_time)"
+
+# Phases timed in run_metrics.jsonl and estimated by --plan
+PHASES = {
+    "daily": ["create_tables", "bulk_upload"],
+    "quarterly": ["create_tables", "insert_tables", "copy2history_table"],
+}
 
 
 def get_connection_str(m_str):
     try:
-        with open(config_file) as f:
-            c = json.load(f)
-            connection_str = c[m_str]
+        connection_str = manager.connection_str(m_str)
     except KeyError as ke:
         logging.error("Wrong key. %s", ke)
         exit(1)
@@ -33,10 +47,9 @@ def connect_postgres(m_str):
     logging.info("Connecting to postgres")
     connect = object()
     try:
-        connection_str = get_connection_str(m_str)
-        engine = sa.create_engine(connection_str)
-        connect = engine.connect()
-    except xx.OperationalError as ex:
+        get_connection_str(m_str)
+        connect = manager.postgres(m_str)
+    except sa.exc.OperationalError as ex:
         logging.error(ex)
         exit(1)
 
@@ -46,13 +59,9 @@ def connect_postgres(m_str):
 def connect_vertica():
     logging.info("Connecting to vertica")
     conn = object()
-    with open(config_file) as f:
-        conn_info = json.load(f)
-        conn_info.pop("pg_str")
-        conn_info["use_prepared_statements"] = True
     try:
-        conn = vertica_python.connect(**conn_info)
-    except ConnectionError as ce:
+        conn = manager.open_vertica()
+    except vertica_errors.ConnectionError as ce:
         logging.error(ce)
         exit(1)
 
@@ -61,40 +70,31 @@ def connect_vertica():
 
 def bulk_upload():
     logging.info("Loading data from csv files")
-    code_base = Path.cwd()
-    my_name = "vertica.sql"
-    sql_file_path = code_base / my_name
-    if sql_file_path.is_file():
-        sql_file_path.unlink()
-
-    csv_files = file_names()
-    with open(my_name, "w") as mysql:
-        for csv_file in csv_files:
-            table_name = csv_file.replace(".csv", "").lower()
-            full_table = v_schema + "." + table_name
-            file_path = os.path.join(file_location, csv_file)
-            insert_str = (
-                "COPY "
-                + full_table
-                + " FROM LOCAL '"
-                + file_path
-                + "' DELIMITER ',' SKIP 1; \n"
-            )
-            mysql.write(insert_str)
+    jobs = []
+    for csv_file in file_names():
+        table_name = csv_file.replace(".csv", "").lower()
+        full_table = v_schema + "." + table_name
+        file_path = os.path.join(file_location, csv_file)
+        jobs.append((full_table, table_name, file_path))
 
     try:
-        logging.info("Running subprocess")
-        return_code = subprocess.Popen("sh batch_load_vertica.sh", shell=True).wait()
-        logging.info("return_code: " + str(return_code))
-        if return_code > 0:
+        reports = vertica_loader.load_files(
+            jobs,
+            manager.vertica,
+            workers=args.vertica_sessions,
+            open_stream=transforms.stream_opener(
+                manifest.transforms(),
+                transforms.VERTICA_FORMAT,
+                profile_store,
+                manifest.shard_sizes(),
+            ),
+        )
+        if vertica_loader.failed_tables(reports):
             logging.error("COPY function didn't work")
             exit(1)
-    except OSError as e:
-        logging.error(e)
-    except ValueError as e:
-        logging.error(e)
-    except Exception as e:
-        logging.error(e)
+        if profile_store is not None:
+            profile_store.report_drift([table for _, table, _ in jobs])
+            profile_store.save([table for _, table, _ in jobs])
     finally:
         logging.info("Done loading tables.")
 
@@ -152,10 +152,10 @@ def insert_tables():
             try:
                 v_cursor.execute(insert_str)
                 v_conn.commit()
-            except MissingSchema as e:
+            except vertica_errors.MissingSchema as e:
                 logging.error(e)
                 exit(1)
-            except QueryError as e:
+            except vertica_errors.QueryError as e:
                 logging.error(e)
                 exit(1)
 
@@ -188,44 +188,81 @@ def table_exists(dbcon, tablename):
 
 
 def copy_table_structure(old_table, new_table):
-    x = (
-        "CREATE TABLE "
-        + new_table
-        + " AS (SELECT * FROM "
-        + old_table
-        + " WHERE 1 = 2);"
-    )
+    # LIKE keeps the partition clause and projections, which partition
+    # snapshots need to match
+    x = "CREATE TABLE " + new_table + " LIKE " + old_table + " INCLUDING PROJECTIONS;"
     try:
         v_cursor.execute(x)
         v_conn.commit()
-    except MissingSchema as e:
+    except vertica_errors.MissingSchema as e:
         logging.error(e)
         exit(1)
-    except QueryError as e:
+    except vertica_errors.QueryError as e:
         logging.error(e)
         exit(1)
 
 
+def quarter_key(moment):
+    """Partition key of HISTORY_PARTITION_EXPR for a point in time"""
+    return moment.year * 100 + (moment.month - 1) // 3 + 1
+
+
+def snapshot_partitions(orig_table, history_table, min_key, max_key):
+    """Replace the history partitions in a key range with the table's own.
+
+    COPY_PARTITIONS_TO_TABLE only references the source's storage
+    containers, so the cost does not grow with the table size. Dropping the
+    range first keeps a re-run in the same quarter from duplicating rows.
+    """
+    v_cursor.execute(
+        f"SELECT DROP_PARTITIONS('{history_table}', '{min_key}', '{max_key}');"
+    )
+    v_cursor.fetchall()
+    v_cursor.execute(
+        f"SELECT COPY_PARTITIONS_TO_TABLE('{orig_table}', '{min_key}', "
+        f"'{max_key}', '{history_table}');"
+    )
+    v_cursor.fetchall()
+    v_conn.commit()
+
+
 def copy2history_table():
     logging.info("Loading history tables")
+    snapshot = mode_settings.get("history_snapshot", "partition") == "partition"
+    # Tables are recreated by this run, so every load_time falls between
+    # the start of the run and now
+    min_key = quarter_key(datetime.fromtimestamp(start_time))
+    max_key = quarter_key(datetime.today())
     for table_name in table_list:
         orig_table = v_schema + "." + table_name
         history_table = v_schema + "." + table_name + "_history"
-        has_history_table = table_exists(v_conn, history_table)
+        has_history_table = table_exists(v_conn, table_name + "_history")
 
         if not has_history_table:
             copy_table_structure(orig_table, history_table)
 
+        if snapshot:
+            try:
+                snapshot_partitions(orig_table, history_table, min_key, max_key)
+                logging.info(f"Attached partitions {min_key}-{max_key} of {orig_table}")
+                continue
+            except vertica_errors.QueryError as e:
+                # e.g. a history table created before it was partitioned
+                v_conn.rollback()
+                logging.warning(
+                    f"Partition snapshot of {orig_table} failed, copying rows: {e}"
+                )
+
         execute_str = (
             "INSERT INTO " + history_table + " (SELECT * FROM " + orig_table + ");"
         )
         try:
             v_cursor.execute(execute_str)
             v_conn.commit()
-        except MissingSchema as e:
+        except vertica_errors.MissingSchema as e:
             logging.error(e)
             exit(1)
-        except QueryError as e:
+        except vertica_errors.QueryError as e:
             logging.error(e)
             exit(1)
 
@@ -280,6 +317,8 @@ def build_query(table, pg_conn, num):
             if mode == "quarterly":
                 b += "load_time timestamp"
 
+        if mode == "quarterly" and "load_time " in b:
+            c = ") PARTITION BY " + HISTORY_PARTITION_EXPR + ";"
         create_v = a + b + c
 
     except Exception as ex:
@@ -293,13 +332,8 @@ def create_tables():
     pg_conn = connect_postgres("pg_str")
 
     if mode == "quarterly":
-        global v_conn, v_cursor
-        v_conn = connect_vertica()
-        v_cursor = v_conn.cursor()
         target_list = table_list
     else:
-        v_conn = connect_vertica()
-        v_cursor = v_conn.cursor()
         target_list = table_names()
 
     try:
@@ -315,28 +349,73 @@ def create_tables():
             try:
                 v_cursor.execute(create_str)
                 v_conn.commit()
-            except MissingSchema as e:
+            except vertica_errors.MissingSchema as e:
                 logging.error(e)
                 exit(1)
-            except QueryError as e:
+            except vertica_errors.QueryError as e:
                 logging.error(e)
                 exit(1)
 
     except Exception as ex:
         logging.error(ex)
     finally:
-        if mode == "daily":
-            v_conn.close()
         pg_conn.close()
         logging.info("Finished creating tables.")
 
 
+def advise_projections():
+    logging.info("Optimizing projections")
+    target_list = table_names() if mode == "daily" else table_list
+    try:
+        with manager.vertica() as conn:
+            vertica_projections.optimize_tables(
+                conn,
+                v_schema,
+                target_list,
+                benchmark=args.benchmark,
+                cardinalities=(
+                    profile_store.cardinalities(target_list) if profile_store else None
+                ),
+            )
+    finally:
+        logging.info("Finished optimizing projections.")
+
+
+def catalog_record_counts(tables):
+    from load_tables_daily import VerticaETL
+
+    query = VerticaETL(config_file).get_table_counts_query(tables, v_schema)
+    try:
+        with manager.vertica() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            return {row[0]: row[1] for row in cursor.fetchall()}
+    except Exception as ex:
+        print("Catalog unavailable, planning from input files only:", ex)
+        return {}
+
+
+def plan_run():
+    targets = file_names() if mode == "daily" else get_lists()[0]
+    phases = PHASES[mode]
+    tables = [name.replace(".csv", "").lower() for name in targets]
+    plan = build_plan(
+        "vertica_upload_" + mode,
+        targets,
+        file_location,
+        phases,
+        catalog_counts=catalog_record_counts(tables),
+        phase_parallelism={"bulk_upload": args.vertica_sessions},
+    )
+    print_plan(plan)
+
+
 def file_names():
     m_list = []
     with open("files.list") as f:
         for line in f:
             m_list.append(line.strip())
-    return m_list
+    return manifest.schedule(m_list, file_location)
 
 
 def table_names():
@@ -352,9 +431,10 @@ def get_lists():
     t_list = []
     with open("files_quart.list") as f:
         for line in f:
-            ll = line.strip()
-            f_list.append(ll)
-            t_list.append(ll.replace(".csv", "").lower())
+            f_list.append(line.strip())
+    f_list = manifest.schedule(f_list, file_location)
+    for ll in f_list:
+        t_list.append(ll.replace(".csv", "").lower())
     return f_list, t_list
 
 
@@ -363,35 +443,127 @@ if __name__ == "__main__":
     parser.add_argument(
         "mode", choices=["daily", "quarterly"], help="Upload mode: daily or quarterly"
     )
+    parser.add_argument(
+        "--advise-projections",
+        action="store_true",
+        help="Create optimized projections (sort, segmentation, encoding) after loading",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Time representative queries before and after projection changes",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the mode settings and tables to load, without connecting",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Estimate rows, bytes and phase durations per table without writing anything",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample stacks per phase and time SQL statements, written under profiles/",
+    )
+    parser.add_argument(
+        "--vertica-sessions",
+        type=int,
+        default=4,
+        help="Pooled Vertica sessions for concurrent COPY and advisor work "
+        "(the control session comes on top)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=DEFAULT_MANIFEST,
+        help="Pipeline manifest with per-mode schemas and paths",
+    )
     args = parser.parse_args()
+    if args.vertica_sessions < 1:
+        parser.error("--vertica-sessions must be at least 1")
 
     mode = args.mode
     start_time = time.time()
     config_file = "config.json"
-    v_schema = "schema_workspace"
+    manager = ConnectionManager(config_file, args.vertica_sessions)
+    manifest = load_manifest(args.manifest)
+    mode_settings = manifest.mode(mode)
+    profile_path = manifest.get("profile_store")
+    profile_store = ProfileStore(profile_path) if profile_path else None
+    v_schema = mode_settings.get("v_schema", "schema_workspace")
     FORMAT = "[%(filename)s:%(lineno)s - %(levelname)s] %(message)s"
 
     if mode == "daily":
-        file_location = "./input"
-        pg_schema = "schema_hi"
-        log_file = "out_vert_dal.log"
+        file_location = mode_settings.get("input_dir", "./input")
+        pg_schema = mode_settings.get("pg_schema", "schema_hi")
+        log_file = mode_settings.get("log_file", "out_vert_dal.log")
     else:
-        file_location = "/data/covid/upload"
-        pg_schema = "schema_rtf"
-        log_file = "out_vert_quart.log"
-
-    logging.basicConfig(level=logging.INFO, filename=log_file, format=FORMAT)
+        file_location = mode_settings.get("input_dir", "/data/covid/upload")
+        pg_schema = mode_settings.get("pg_schema", "schema_rtf")
+        log_file = mode_settings.get("log_file", "out_vert_quart.log")
+
+    if args.dry_run:
+        targets = file_names() if mode == "daily" else get_lists()[0]
+        print(f"mode={mode} input={file_location} pg_schema={pg_schema} v_schema={v_schema}")
+        for name in targets:
+            print(name)
+        exit(0)
+
+    if args.plan:
+        plan_run()
+        exit(0)
+
+    listener = setup_logging(log_file, FORMAT)
     logging.info("BEGIN")
-
-    if mode == "daily":
-        create_tables()
-        bulk_upload()
-    else:
-        file_list, table_list = get_lists()
-        create_tables()
-        insert_tables()
-        copy2history_table()
-        v_conn.close()
+    metrics = RunMetrics("vertica_upload_" + mode)
+    profiler = RunProfiler("vertica_upload_" + mode) if args.profile else None
+    if profiler is not None:
+        profiler.ignore_thread(listener._thread)
+        profiler.start()
+        profiler.instrument_loader(vertica_loader)
+        metrics.profiler = profiler
+
+    # One control session is shared by every phase, outside the pool;
+    # the --vertica-sessions pooled sessions are left to concurrent work.
+    v_conn = connect_vertica()
+    v_cursor = v_conn.cursor()
+    if profiler is not None:
+        v_cursor = profiler.cursor(v_cursor)
+    try:
+        if mode == "daily":
+            with metrics.phase("create_tables"):
+                create_tables()
+            with metrics.phase("bulk_upload"):
+                bulk_upload()
+            if args.advise_projections:
+                advise_projections()
+            loaded_files = file_names()
+        else:
+            file_list, table_list = get_lists()
+            with metrics.phase("create_tables"):
+                create_tables()
+            with metrics.phase("insert_tables"):
+                insert_tables()
+            # Snapshot first: COPY_PARTITIONS_TO_TABLE needs the same
+            # projections on both tables, and the advisor adds <table>_opt
+            with metrics.phase("copy2history_table"):
+                copy2history_table()
+            if args.advise_projections:
+                advise_projections()
+            loaded_files = file_list
+    finally:
+        manager.close_all()
+        if profiler is not None:
+            profiler.stop()
+            profiler.write()
+
+    for name in loaded_files:
+        metrics.add_table(
+            name.replace(".csv", "").lower(), os.path.join(file_location, name)
+        )
+    metrics.save()
 
     run_time = "--- %s seconds ---" % (time.time() - start_time)
     logging.info("END %s", run_time)